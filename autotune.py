@@ -0,0 +1,170 @@
+"""
+Hardware autotuner for CPU inference settings.
+
+Sweeps batch size, intra-op thread count and BLAS thread count for the
+exported model on this machine, timing forward passes over real
+assets/dataset images. A configuration is only timed once its output matches
+the single-thread forward pass. The one with the best throughput whose p95
+batch latency stays under the ceiling is saved as this host's profile
+(assets/model/profiles/<hostname>.json), which MobileNetV2.from_tfjs,
+cascade_classifier.py and bulk_classify.py load at startup.
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+from datetime import datetime
+
+import numpy as np
+
+from health_model import MODEL_PATH, PROFILES_PATH, MobileNetV2, host_profile_path, list_split, load_batch
+from parallel_inference import threadpool_limits
+
+BATCH_SIZES = (1, 2, 4, 8, 16, 32, 64)
+# Largest probability difference from the single-thread output a configuration may show
+TOLERANCE = 1e-4
+
+
+def thread_options(cores):
+    """Powers of two up to the core count, plus the core count itself"""
+
+    options = {1, cores}
+    threads = 2
+    while threads < cores:
+        options.add(threads)
+        threads *= 2
+    return sorted(options)
+
+
+def blas_options(threads, cores):
+    """BLAS thread counts worth trying next to `threads` intra-op threads"""
+
+    if threadpool_limits is None:
+        # Without threadpoolctl BLAS threading can't be changed at runtime
+        return [None]
+    return sorted({1, max(1, cores // threads)})
+
+
+def load_sample_images(count):
+    """Decode up to `count` images drawn from every dataset split"""
+
+    paths = []
+    for split in ("train", "valid", "test"):
+        paths += [path for path, _ in list_split(split)]
+    step = max(1, len(paths) // count)
+    return load_batch(paths[::step][:count])
+
+
+def sample_batch(images, batch_size):
+    """The first batch_size sample images, repeated if there are fewer"""
+
+    if len(images) >= batch_size:
+        return images[:batch_size]
+    return np.resize(images, (batch_size,) + images.shape[1:])
+
+
+def measure(model, images, batch_size, min_seconds=2.0, min_batches=5):
+    """Time repeated batches: returns (images/s, p95 batch latency in ms)"""
+
+    batch = sample_batch(images, batch_size)
+    model.predict(batch)  # warm-up: arena allocation, thread pool start
+
+    latencies = []
+    start = time.perf_counter()
+    while len(latencies) < min_batches or time.perf_counter() - start < min_seconds:
+        batch_start = time.perf_counter()
+        model.predict(batch)
+        latencies.append(time.perf_counter() - batch_start)
+
+    throughput = batch_size * len(latencies) / sum(latencies)
+    return throughput, float(np.percentile(latencies, 95) * 1000)
+
+
+def autotune(latency_ceiling_ms, batch_sizes=BATCH_SIZES, max_threads=None, min_seconds=2.0, model_path=MODEL_PATH):
+    """Sweep all configurations and return the host profile dict"""
+
+    cores = max_threads or os.cpu_count()
+    images = load_sample_images(max(batch_sizes))
+    model = MobileNetV2.from_tfjs(model_path, threads=1)
+
+    print(f"🔧 Sweeping on {socket.gethostname()} ({cores} cores, {len(images)} sample images)")
+    if threadpool_limits is None:
+        print("⚠️  threadpoolctl not installed: BLAS thread count is not swept (pip install threadpoolctl)")
+
+    reference = model.predict(sample_batch(images, max(batch_sizes)))
+
+    results = []
+    for threads in thread_options(cores):
+        for blas_threads in blas_options(threads, cores):
+            model.set_threads(threads, blas_threads)
+            for batch_size in batch_sizes:
+                difference = np.abs(model.predict(sample_batch(images, batch_size)) - reference[:batch_size]).max()
+                if difference > TOLERANCE:
+                    print(f"  ❌ threads {threads:>2}  blas {str(blas_threads):>4}  batch {batch_size:>3}: "
+                          f"output differs from single-thread by {difference:.2e}, skipped")
+                    continue
+
+                throughput, p95 = measure(model, images, batch_size, min_seconds)
+                results.append({
+                    "threads": threads,
+                    "blas_threads": blas_threads,
+                    "batch_size": batch_size,
+                    "throughput": round(throughput, 2),
+                    "p95_latency_ms": round(p95, 1),
+                })
+                within = "✓" if p95 <= latency_ceiling_ms else " "
+                print(f"  {within} threads {threads:>2}  blas {str(blas_threads):>4}  batch {batch_size:>3}: "
+                      f"{throughput:7.1f} images/s  p95 {p95:8.1f} ms")
+    model.set_threads(1)
+
+    eligible = [result for result in results if result["p95_latency_ms"] <= latency_ceiling_ms]
+    if eligible:
+        best = max(eligible, key=lambda result: result["throughput"])
+    else:
+        print(f"⚠️  No configuration meets the {latency_ceiling_ms} ms ceiling, using the lowest-latency one")
+        best = min(results, key=lambda result: result["p95_latency_ms"])
+
+    return {
+        "host": socket.gethostname(),
+        "cpu_count": os.cpu_count(),
+        "created": datetime.now().isoformat(),
+        "latency_ceiling_ms": latency_ceiling_ms,
+        **best,
+        "results": results,
+    }
+
+
+def save_profile(profile):
+    os.makedirs(PROFILES_PATH, exist_ok=True)
+    profile_path = host_profile_path(profile["host"])
+    with open(profile_path, 'w') as f:
+        json.dump(profile, f, indent=2)
+    return profile_path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cocoscan CPU inference autotuner")
+    parser.add_argument("--latency-ceiling", type=float, default=1000.0,
+                        help="p95 latency ceiling per batch in milliseconds")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=list(BATCH_SIZES))
+    parser.add_argument("--max-threads", type=int, default=None, help="Highest thread count to try (default: cores)")
+    parser.add_argument("--min-seconds", type=float, default=2.0, help="Measurement time per configuration")
+    args = parser.parse_args()
+
+    print("Cocoscan Hardware Autotuner")
+    print("=" * 50)
+
+    if not os.path.exists(os.path.join(MODEL_PATH, "model.weights.bin")):
+        print(f"❌ model.weights.bin not found in: {MODEL_PATH}")
+        sys.exit(1)
+
+    profile = autotune(args.latency_ceiling, args.batch_sizes, args.max_threads, args.min_seconds)
+    profile_path = save_profile(profile)
+
+    print(f"\n✅ Best configuration: batch {profile['batch_size']}, {profile['threads']} threads, "
+          f"BLAS {profile['blas_threads']} -> {profile['throughput']:.1f} images/s "
+          f"(p95 {profile['p95_latency_ms']:.1f} ms)")
+    print(f"📄 Profile saved to: {profile_path}")
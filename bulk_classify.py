@@ -0,0 +1,344 @@
+"""
+Resumable bulk classification of a directory tree of survey photos.
+
+Images are split into batches and classified by a pool of worker processes,
+each holding its own copy of the model. Results are streamed to CSV (or to a
+directory of Parquet parts) with the same fields as the app's HealthPrediction
+plus the image path. A progress file next to the output records every
+finished batch, so a killed job picks up where it stopped.
+"""
+
+import os
+
+# Each worker process runs its own forward pass; keep BLAS single threaded per
+# process so N workers don't start N x cores threads. Must be set before numpy loads.
+for _variable in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+    os.environ.setdefault(_variable, "1")
+
+import sys
+import csv
+import json
+import time
+import argparse
+from datetime import datetime, timezone
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+
+from health_model import IMAGE_EXTENSIONS, MODEL_PATH, MobileNetV2, load_host_profile, load_image, load_labels
+
+# Same fields as HealthPrediction in app/lib/healthClassificationService.ts
+HEALTH_PREDICTION_FIELDS = ["prediction", "confidence", "timestamp"]
+OUTPUT_FIELDS = ["path"] + HEALTH_PREDICTION_FIELDS
+
+_worker_model = None
+_worker_labels = None
+_worker_cascade = False
+
+
+def find_images(input_path):
+    """All image files below input_path, as sorted paths relative to it"""
+
+    images = []
+    for root, _, files in os.walk(input_path):
+        for file in files:
+            if file.lower().endswith(IMAGE_EXTENSIONS):
+                images.append(os.path.relpath(os.path.join(root, file), input_path))
+    return sorted(images)
+
+
+def _init_worker(model_path, use_cascade, threads):
+    global _worker_model, _worker_labels, _worker_cascade
+    _worker_labels = load_labels(model_path)
+    _worker_cascade = use_cascade
+    if use_cascade:
+        from cascade_classifier import CascadeClassifier
+        _worker_model = CascadeClassifier.load(model_path=model_path, threads=threads)
+    else:
+        _worker_model = MobileNetV2.from_tfjs(model_path, threads)
+
+
+def _timestamp():
+    # Matches JavaScript's Date.toISOString()
+    return datetime.now(timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+
+def classify_batch(input_path, batch):
+    """Worker: classify one batch of relative paths, returning (rows, errors)"""
+
+    if _worker_cascade:
+        paths, probabilities, errors = _classify_cascade(input_path, batch)
+    else:
+        paths, images, errors = [], [], []
+        for relative_path in batch:
+            try:
+                images.append(load_image(os.path.join(input_path, relative_path)))
+                paths.append(relative_path)
+            except Exception as e:
+                errors.append({"path": relative_path, "error": str(e)})
+        probabilities = _worker_model.predict(np.stack(images)) if images else []
+
+    rows = []
+    if paths:
+        for relative_path, probs in zip(paths, probabilities):
+            index = int(np.argmax(probs))
+            rows.append({
+                "path": relative_path,
+                "prediction": _worker_labels[index],
+                "confidence": round(float(probs[index]) * 100, 1),
+                "timestamp": _timestamp(),
+            })
+    return rows, errors
+
+
+def _classify_cascade(input_path, batch):
+    """
+    Cascade mode: every image is decoded inside its own try (stage 1 features,
+    then the full-size image if it doesn't exit early), so one bad file is
+    reported as an error instead of failing the whole batch
+    """
+
+    from cascade_classifier import extract_features
+
+    paths, features, errors = [], [], []
+    for relative_path in batch:
+        try:
+            features.append(extract_features(os.path.join(input_path, relative_path)))
+            paths.append(relative_path)
+        except Exception as e:
+            errors.append({"path": relative_path, "error": str(e)})
+    if not paths:
+        return [], [], errors
+
+    probabilities, exited = _worker_model.stage1_predict(np.stack(features))
+    keep = list(range(len(paths)))
+    forwarded, images = [], []
+    for i in np.flatnonzero(~exited):
+        try:
+            images.append(load_image(os.path.join(input_path, paths[i])))
+            forwarded.append(i)
+        except Exception as e:
+            errors.append({"path": paths[i], "error": str(e)})
+            keep.remove(i)
+    if images:
+        probabilities[forwarded] = _worker_model.full_model.predict(np.stack(images))
+
+    return [paths[i] for i in keep], probabilities[keep], errors
+
+
+class ResumeError(Exception):
+    """The output no longer matches the progress file, so the job can't resume"""
+
+
+class CsvSink:
+    """Appends rows to a CSV file; the checkpoint is the byte offset after each flush"""
+
+    def __init__(self, output_path):
+        self.output_path = output_path
+
+    def restore(self, checkpoints):
+        offsets = [checkpoint["csv_offset"] for checkpoint in checkpoints if "csv_offset" in checkpoint]
+        offset = offsets[-1] if offsets else 0
+        exists = os.path.exists(self.output_path)
+        if offset and (not exists or os.path.getsize(self.output_path) < offset):
+            raise ResumeError(f"{self.output_path} is missing or shorter than its progress file says")
+        self.file = open(self.output_path, 'r+' if exists else 'w', newline='', encoding='utf-8')
+        # Drop anything written after the last checkpoint (a batch cut off by the kill)
+        self.file.truncate(offset)
+        self.file.seek(offset)
+        self.writer = csv.DictWriter(self.file, fieldnames=OUTPUT_FIELDS)
+        if offset == 0:
+            self.writer.writeheader()
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        return {"csv_offset": self.file.tell()}
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetSink:
+    """Writes each batch as its own Parquet part inside the output directory"""
+
+    def __init__(self, output_path):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            print("❌ Parquet output needs pyarrow: pip install pyarrow")
+            sys.exit(1)
+        self.pyarrow = pyarrow
+        self.output_path = output_path
+
+    def restore(self, checkpoints):
+        os.makedirs(self.output_path, exist_ok=True)
+        parts = {checkpoint["part"] for checkpoint in checkpoints if "part" in checkpoint}
+        missing = sorted(part for part in parts if not os.path.exists(os.path.join(self.output_path, part)))
+        if missing:
+            raise ResumeError(f"{len(missing)} Parquet parts in the progress file are missing from {self.output_path}")
+        # Parts written after the last checkpoint are incomplete or unrecorded
+        for file in os.listdir(self.output_path):
+            if file.endswith(".parquet") and file not in parts:
+                os.remove(os.path.join(self.output_path, file))
+        self.part_index = len(checkpoints)
+
+    def write(self, rows):
+        part = f"part-{self.part_index:05d}.parquet"
+        self.part_index += 1
+        table = self.pyarrow.Table.from_pylist(rows, schema=self.pyarrow.schema([
+            ("path", self.pyarrow.string()),
+            ("prediction", self.pyarrow.string()),
+            ("confidence", self.pyarrow.float64()),
+            ("timestamp", self.pyarrow.string()),
+        ]))
+        self.pyarrow.parquet.write_table(table, os.path.join(self.output_path, part))
+        return {"part": part}
+
+    def close(self):
+        pass
+
+
+def load_checkpoints(progress_path):
+    """Read the progress file, ignoring a final line cut off by a kill"""
+
+    checkpoints = []
+    if not os.path.exists(progress_path):
+        return checkpoints
+    with open(progress_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                checkpoints.append(json.loads(line))
+            except json.JSONDecodeError:
+                break
+    return checkpoints
+
+
+def _format_duration(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:d}:{minutes:02d}:{seconds:02d}"
+
+
+def run_bulk_job(input_path, output_path, workers=None, batch_size=32, model_path=MODEL_PATH, use_cascade=False,
+                 threads=1):
+    """
+    Classify every image below input_path, resuming from output_path's progress file
+
+    threads is the intra-op thread count of each worker's model; by default the
+    pool gets one worker per group of `threads` cores. Raises ResumeError if the
+    output no longer matches the progress file.
+    """
+
+    sink = ParquetSink(output_path) if output_path.endswith(".parquet") else CsvSink(output_path)
+    progress_path = output_path.rstrip("/\\") + ".progress.jsonl"
+
+    checkpoints = load_checkpoints(progress_path)
+    sink.restore(checkpoints)
+    # Rewrite the progress file without a possibly truncated last line
+    with open(progress_path, 'w', encoding='utf-8') as f:
+        for checkpoint in checkpoints:
+            f.write(json.dumps(checkpoint) + "\n")
+
+    done = {path for checkpoint in checkpoints for path in checkpoint["files"]}
+    images = find_images(input_path)
+    pending = [path for path in images if path not in done]
+    batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+
+    print(f"📁 {len(images)} images found, {len(done)} already done, {len(pending)} to classify")
+    if not pending:
+        sink.close()
+        return True
+
+    workers = workers or max(1, os.cpu_count() // threads)
+    # Only a few batches per worker are queued at a time, so a failure doesn't leave the whole job in the pool
+    window = workers * 2
+    start = time.perf_counter()
+    classified = 0
+    failed = 0
+
+    with open(progress_path, 'a', encoding='utf-8') as progress, \
+            ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                initargs=(model_path, use_cascade, threads)) as executor:
+        futures = {}
+        next_batch = 0
+        try:
+            while next_batch < len(batches) or futures:
+                while next_batch < len(batches) and len(futures) < window:
+                    futures[executor.submit(classify_batch, input_path, batches[next_batch])] = batches[next_batch]
+                    next_batch += 1
+
+                finished, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    batch = futures.pop(future)
+                    rows, errors = future.result()
+                    checkpoint = sink.write(rows) if rows else {}
+                    checkpoint["files"] = batch
+                    checkpoint["errors"] = errors
+                    progress.write(json.dumps(checkpoint) + "\n")
+                    progress.flush()
+
+                    classified += len(batch)
+                    failed += len(errors)
+                    for error in errors:
+                        print(f"⚠️  {error['path']}: {error['error']}")
+
+                    elapsed = time.perf_counter() - start
+                    rate = classified / elapsed
+                    eta = (len(pending) - classified) / rate
+                    print(f"  {len(done) + classified}/{len(images)} images | "
+                          f"{rate:.1f} images/s | ETA {_format_duration(eta)}")
+        except BaseException:
+            # Drop queued batches instead of running them (unrecorded) while the pool shuts down
+            executor.shutdown(cancel_futures=True)
+            sink.close()
+            raise
+
+    sink.close()
+    elapsed = time.perf_counter() - start
+    print(f"✅ Classified {classified - failed} images in {_format_duration(elapsed)} "
+          f"({classified / elapsed:.1f} images/s), {failed} failed")
+    print(f"📄 Results: {output_path}")
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cocoscan bulk health classification")
+    parser.add_argument("input", help="Directory tree of images to classify")
+    parser.add_argument("output", help="Output .csv file or .parquet directory")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count // threads)")
+    parser.add_argument("--batch-size", type=int, default=None,
+                        help="Images per batch (default: host profile, else 32)")
+    parser.add_argument("--threads", type=int, default=None,
+                        help="Intra-op threads per worker (default: host profile, else 1)")
+    parser.add_argument("--model-path", default=MODEL_PATH)
+    parser.add_argument("--cascade", action="store_true", help="Use the two-stage cascade (cascade.json)")
+    args = parser.parse_args()
+
+    print("Cocoscan Bulk Classification")
+    print("=" * 50)
+
+    if not os.path.isdir(args.input):
+        print(f"❌ Input directory not found: {args.input}")
+        sys.exit(1)
+    if not os.path.exists(os.path.join(args.model_path, "model.weights.bin")):
+        print(f"❌ model.weights.bin not found in: {args.model_path}")
+        sys.exit(1)
+    if args.cascade and not os.path.exists(os.path.join(args.model_path, "cascade.json")):
+        print(f"❌ cascade.json not found in: {args.model_path}")
+        print("Please run 'python cascade_classifier.py build' first")
+        sys.exit(1)
+
+    profile = load_host_profile() or {}
+    batch_size = args.batch_size or profile.get("batch_size", 32)
+    threads = args.threads or profile.get("threads", 1)
+
+    try:
+        run_bulk_job(args.input, args.output, args.workers, batch_size, args.model_path, args.cascade, threads)
+    except ResumeError as e:
+        progress_path = args.output.rstrip("/\\") + ".progress.jsonl"
+        print(f"❌ Can't resume: {e}")
+        print(f"Delete {progress_path} to start the job over")
+        sys.exit(1)
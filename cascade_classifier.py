@@ -0,0 +1,293 @@
+"""
+Two-stage cascade for Healthy/Unhealthy classification.
+
+Stage 1 is a cheap colour/texture histogram + logistic regression model trained
+on assets/dataset/train. Images it is confident about exit early; the rest are
+forwarded to the full MobileNetV2. The exit threshold is tuned on the valid
+split so the cascade still reaches a target accuracy.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import numpy as np
+from PIL import Image
+
+from health_model import MODEL_PATH, MobileNetV2, list_split, load_host_profile, load_labels
+
+CASCADE_PATH = os.path.join(MODEL_PATH, "cascade.json")
+
+FEATURE_SIZE = 64
+HUE_BINS = 12
+SATURATION_BINS = 4
+VALUE_BINS = 4
+GRADIENT_BINS = 8
+
+
+def extract_features(path):
+    """Colour (HSV) and texture (gradient magnitude) histogram features for one image"""
+
+    with Image.open(path) as image:
+        # JPEG draft mode decodes straight at reduced scale, which is most of the saving
+        image.draft("RGB", (FEATURE_SIZE * 2, FEATURE_SIZE * 2))
+        image = image.convert("RGB").resize((FEATURE_SIZE, FEATURE_SIZE), Image.BILINEAR)
+        rgb = np.asarray(image, dtype=np.float32) / 255.0
+        hsv = np.asarray(image.convert("HSV"), dtype=np.float32) / 255.0
+
+    features = []
+    for channel, bins in zip(range(3), (HUE_BINS, SATURATION_BINS, VALUE_BINS)):
+        histogram, _ = np.histogram(hsv[..., channel], bins=bins, range=(0.0, 1.0))
+        features.append(histogram / histogram.sum())
+
+    gray = rgb.mean(axis=-1)
+    gradient = np.hypot(np.diff(gray, axis=0)[:, :-1], np.diff(gray, axis=1)[:-1, :])
+    histogram, _ = np.histogram(gradient, bins=GRADIENT_BINS, range=(0.0, 0.5))
+    features.append(histogram / histogram.sum())
+
+    features.append(rgb.mean(axis=(0, 1)))
+    features.append(rgb.std(axis=(0, 1)))
+    return np.concatenate(features).astype(np.float32)
+
+
+def extract_feature_matrix(paths):
+    return np.stack([extract_features(path) for path in paths])
+
+
+def _sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+def train_linear_model(features, targets, epochs=2000, learning_rate=0.5, l2=1e-3):
+    """
+    Class-balanced logistic regression trained with full-batch gradient descent
+
+    Returns a dict holding the feature standardisation and the weights so the
+    model can be stored in cascade.json.
+    """
+
+    mean = features.mean(axis=0)
+    std = features.std(axis=0) + 1e-6
+    x = (features - mean) / std
+    y = targets.astype(np.float32)
+
+    # Weight each class by inverse frequency (train is ~1:3 Healthy:Unhealthy)
+    positives = max(y.sum(), 1.0)
+    negatives = max(len(y) - y.sum(), 1.0)
+    sample_weights = np.where(y == 1, len(y) / (2 * positives), len(y) / (2 * negatives))
+
+    weights = np.zeros(x.shape[1], dtype=np.float32)
+    bias = 0.0
+    for _ in range(epochs):
+        error = (_sigmoid(x @ weights + bias) - y) * sample_weights
+        weights -= learning_rate * (x.T @ error / len(y) + l2 * weights)
+        bias -= learning_rate * error.mean()
+
+    return {
+        "mean": mean.tolist(),
+        "std": std.tolist(),
+        "weights": weights.tolist(),
+        "bias": float(bias),
+    }
+
+
+def linear_probabilities(model, features):
+    """Probability of the second label (Unhealthy) under the stage 1 model"""
+
+    x = (features - np.asarray(model["mean"])) / np.asarray(model["std"])
+    return _sigmoid(x @ np.asarray(model["weights"]) + model["bias"])
+
+
+def cascade_predictions(stage1_probabilities, full_predictions, threshold):
+    """Combine both stages: confident stage 1 predictions exit, the rest use the full model"""
+
+    confidence = np.maximum(stage1_probabilities, 1.0 - stage1_probabilities)
+    exits = confidence >= threshold
+    predictions = np.where(exits, (stage1_probabilities >= 0.5).astype(int), full_predictions)
+    return predictions, exits
+
+
+def tune_threshold(stage1_probabilities, full_predictions, targets, target_accuracy):
+    """
+    Lowest confidence threshold (most early exits) whose cascade accuracy on the
+    tuning split is still at least target_accuracy. Returns a threshold above 1.0
+    (nothing exits) if no threshold reaches the target.
+    """
+
+    confidence = np.maximum(stage1_probabilities, 1.0 - stage1_probabilities)
+    for threshold in np.unique(confidence):
+        predictions, _ = cascade_predictions(stage1_probabilities, full_predictions, threshold)
+        if (predictions == targets).mean() >= target_accuracy:
+            return float(threshold)
+    return 1.01
+
+
+class CascadeClassifier:
+    """Stage 1 linear model with early exit, falling back to the full MobileNetV2"""
+
+    def __init__(self, stage1, threshold, full_model=None, batch_size=16):
+        self.stage1 = stage1
+        self.threshold = threshold
+        self.full_model = full_model
+        self.batch_size = batch_size
+
+    @classmethod
+    def load(cls, cascade_path=None, model_path=MODEL_PATH, batch_size=16, threads=None):
+        """Load cascade.json (from model_path unless cascade_path is given) and the full model"""
+
+        cascade_path = cascade_path or os.path.join(model_path, "cascade.json")
+        with open(cascade_path, 'r') as f:
+            config = json.load(f)
+        full_model = MobileNetV2.from_tfjs(model_path, threads)
+        return cls(config["stage1"], config["threshold"], full_model, batch_size)
+
+    def stage1_predict(self, features):
+        """
+        Stage 1 only: (probabilities, exited) for a feature matrix. Rows that did
+        not exit still need the full model.
+        """
+
+        stage1 = linear_probabilities(self.stage1, features)
+        exited = np.maximum(stage1, 1.0 - stage1) >= self.threshold
+        return np.stack([1.0 - stage1, stage1], axis=1), exited
+
+    def predict_paths(self, paths):
+        """
+        Classify image files, returning (probabilities, exited) where exited marks
+        images answered by stage 1 alone
+        """
+
+        if not paths:
+            return np.zeros((0, 2), dtype=np.float32), np.zeros(0, dtype=bool)
+
+        probabilities, exited = self.stage1_predict(extract_feature_matrix(paths))
+        forwarded = np.flatnonzero(~exited)
+        if len(forwarded):
+            probabilities[forwarded] = self.full_model.predict_paths(
+                [paths[i] for i in forwarded], self.batch_size
+            )
+        return probabilities, exited
+
+
+def build_cascade(target_accuracy=None, batch_size=16):
+    """Train stage 1 on train, tune the exit threshold on valid and save cascade.json"""
+
+    labels = load_labels()
+    train = list_split("train", labels)
+    valid = list_split("valid", labels)
+
+    print(f"🔄 Extracting stage 1 features ({len(train)} train / {len(valid)} valid images)...")
+    train_features = extract_feature_matrix([path for path, _ in train])
+    train_targets = np.array([label for _, label in train])
+    stage1 = train_linear_model(train_features, train_targets)
+
+    valid_paths = [path for path, _ in valid]
+    valid_targets = np.array([label for _, label in valid])
+    valid_stage1 = linear_probabilities(stage1, extract_feature_matrix(valid_paths))
+
+    print("🔄 Running full model on valid split...")
+    full_model = MobileNetV2.from_tfjs()
+    valid_full = full_model.predict_paths(valid_paths, batch_size).argmax(axis=1)
+
+    full_accuracy = float((valid_full == valid_targets).mean())
+    stage1_accuracy = float(((valid_stage1 >= 0.5) == valid_targets).mean())
+    if target_accuracy is None:
+        target_accuracy = full_accuracy
+
+    threshold = tune_threshold(valid_stage1, valid_full, valid_targets, target_accuracy)
+    predictions, exits = cascade_predictions(valid_stage1, valid_full, threshold)
+
+    print(f"  - Stage 1 accuracy (valid): {stage1_accuracy:.3f}")
+    print(f"  - Full model accuracy (valid): {full_accuracy:.3f}")
+    print(f"  - Target accuracy: {target_accuracy:.3f}")
+    print(f"  - Exit threshold: {threshold:.3f}")
+    print(f"  - Cascade accuracy (valid): {(predictions == valid_targets).mean():.3f}")
+    print(f"  - Early exits (valid): {exits.mean():.1%}")
+
+    config = {
+        "labels": labels,
+        "stage1": stage1,
+        "threshold": threshold,
+        "target_accuracy": target_accuracy,
+    }
+    with open(CASCADE_PATH, 'w') as f:
+        json.dump(config, f, indent=2)
+
+    print(f"✅ Cascade saved to: {CASCADE_PATH}")
+    return config
+
+
+def evaluate_cascade(split="test", batch_size=16, repeats=3):
+    """
+    Report accuracy, early-exit rate and throughput of full-only vs cascade
+
+    Both passes are warmed up first (file cache, executor buffers), then run
+    `repeats` times in alternating order; the best time of each is reported.
+    """
+
+    samples = list_split(split)
+    paths = [path for path, _ in samples]
+    targets = np.array([label for _, label in samples])
+
+    cascade = CascadeClassifier.load(batch_size=batch_size)
+
+    # Warm-up: read every file once and let the full model plan its buffers
+    for path in paths:
+        with open(path, 'rb') as f:
+            f.read()
+    cascade.full_model.predict_paths(paths[:batch_size], batch_size)
+
+    full_seconds = cascade_seconds = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        full_probabilities = cascade.full_model.predict_paths(paths, batch_size)
+        full_seconds = min(full_seconds, time.perf_counter() - start)
+
+        start = time.perf_counter()
+        cascade_probabilities, exited = cascade.predict_paths(paths)
+        cascade_seconds = min(cascade_seconds, time.perf_counter() - start)
+
+    full_accuracy = (full_probabilities.argmax(axis=1) == targets).mean()
+    cascade_accuracy = (cascade_probabilities.argmax(axis=1) == targets).mean()
+
+    print(f"\n📊 Cascade report ({split}, {len(paths)} images, best of {repeats} warm runs)")
+    print(f"  - Early exits: {exited.sum()} / {len(paths)} ({exited.mean():.1%})")
+    print(f"  - Full model: accuracy {full_accuracy:.3f}, {len(paths) / full_seconds:.1f} images/s")
+    print(f"  - Cascade:    accuracy {cascade_accuracy:.3f}, {len(paths) / cascade_seconds:.1f} images/s")
+    print(f"  - Throughput gain: {full_seconds / cascade_seconds:.2f}x")
+
+    return {
+        "early_exit_fraction": float(exited.mean()),
+        "full_accuracy": float(full_accuracy),
+        "cascade_accuracy": float(cascade_accuracy),
+        "speedup": full_seconds / cascade_seconds,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cocoscan two-stage cascade classifier")
+    parser.add_argument("command", choices=["build", "evaluate"])
+    parser.add_argument("--target-accuracy", type=float, default=None,
+                        help="Valid accuracy the cascade must keep (default: full model accuracy)")
+    parser.add_argument("--split", default="test", help="Split used by evaluate")
+    parser.add_argument("--batch-size", type=int, default=None,
+                        help="Full model batch size (default: host profile, else 16)")
+    args = parser.parse_args()
+
+    profile = load_host_profile()
+    if args.batch_size is None:
+        args.batch_size = profile["batch_size"] if profile else 16
+
+    print("Cocoscan Cascade Classifier")
+    print("=" * 50)
+
+    if not os.path.exists(os.path.join(MODEL_PATH, "model.weights.bin")):
+        print(f"❌ model.weights.bin not found in: {MODEL_PATH}")
+        print("Please run convert_model_final.py first")
+        sys.exit(1)
+
+    if args.command == "build":
+        build_cascade(args.target_accuracy, args.batch_size)
+    else:
+        evaluate_cascade(args.split, args.batch_size)
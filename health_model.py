@@ -0,0 +1,308 @@
+"""
+Shared helpers for the offline (Python) side of cocoscan health classification.
+
+Loads the converted TensorFlow.js artifacts from assets/model (model.json +
+model.weights.bin) and runs the MobileNetV2 forward pass with plain NumPy, so
+scripts can classify the assets/dataset images without TensorFlow installed.
+"""
+
+import os
+import json
+import math
+import socket
+import numpy as np
+from PIL import Image
+
+from memory_planner import PlannedExecutor, build_graph, plan_memory
+from parallel_inference import ParallelExecutor, limit_blas_threads
+
+PROJECT_PATH = os.path.dirname(os.path.abspath(__file__))
+DATASET_PATH = os.path.join(PROJECT_PATH, "assets", "dataset")
+MODEL_PATH = os.path.join(PROJECT_PATH, "assets", "model")
+PROFILES_PATH = os.path.join(MODEL_PATH, "profiles")
+
+IMAGE_SIZE = 224
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+BN_EPSILON = 1e-3
+
+# MobileNetV2 inverted residual blocks that downsample (block_1, block_3, ...)
+STRIDE_2_BLOCKS = (1, 3, 6, 13)
+
+
+def load_labels(model_path=MODEL_PATH):
+    """Load class labels from labels.json (falls back to Healthy/Unhealthy)"""
+
+    labels_path = os.path.join(model_path, "labels.json")
+    if not os.path.exists(labels_path):
+        return ["Healthy", "Unhealthy"]
+
+    with open(labels_path, 'r') as f:
+        return json.load(f)
+
+
+def host_profile_path(host=None):
+    return os.path.join(PROFILES_PATH, f"{host or socket.gethostname()}.json")
+
+
+def load_host_profile(host=None):
+    """Autotuned batch size / thread settings for this machine (see autotune.py), or None"""
+
+    profile_path = host_profile_path(host)
+    if not os.path.exists(profile_path):
+        return None
+
+    with open(profile_path, 'r') as f:
+        return json.load(f)
+
+
+def list_split(split, labels=None, dataset_path=DATASET_PATH):
+    """Return sorted (image_path, label_index) pairs for a dataset split"""
+
+    labels = labels or load_labels()
+    split_path = os.path.join(dataset_path, split)
+    if not os.path.isdir(split_path):
+        raise FileNotFoundError(f"Dataset split not found: {split_path}")
+
+    samples = []
+    for index, label in enumerate(labels):
+        class_path = os.path.join(split_path, label)
+        if not os.path.isdir(class_path):
+            continue
+        for file in sorted(os.listdir(class_path)):
+            if file.lower().endswith(IMAGE_EXTENSIONS):
+                samples.append((os.path.join(class_path, file), index))
+    return samples
+
+
+def load_image(path, size=IMAGE_SIZE):
+    """Decode an image into a float32 HWC array scaled to [-1, 1] (MobileNetV2 preprocessing)"""
+
+    with Image.open(path) as image:
+        image = image.convert("RGB").resize((size, size), Image.BILINEAR)
+        pixels = np.asarray(image, dtype=np.float32)
+    return pixels / 127.5 - 1.0
+
+
+def load_batch(paths, size=IMAGE_SIZE):
+    """Decode several images into one NHWC float32 batch"""
+
+    return np.stack([load_image(path, size) for path in paths])
+
+
+def _relu6(x):
+    return np.clip(x, 0.0, 6.0)
+
+
+def _conv_stem(x, kernel, bias):
+    """3x3 stride-2 convolution ('same' padding) as im2col + matmul"""
+
+    n, h, w, c = x.shape
+    padded = np.pad(x, ((0, 0), (0, 1), (0, 1), (0, 0)))
+    oh, ow = h // 2, w // 2
+    patches = [padded[:, i:i + 2 * oh:2, j:j + 2 * ow:2, :] for i in range(3) for j in range(3)]
+    columns = np.concatenate(patches, axis=-1).reshape(n * oh * ow, 9 * c)
+    out = columns @ kernel + bias
+    return _relu6(out).reshape(n, oh, ow, -1)
+
+
+def _pointwise(x, kernel, bias, relu=True):
+    """1x1 convolution as a single matmul over all pixels"""
+
+    n, h, w, c = x.shape
+    out = x.reshape(n * h * w, c) @ kernel + bias
+    if relu:
+        out = _relu6(out)
+    return out.reshape(n, h, w, -1)
+
+
+def _depthwise(x, kernel, bias, stride):
+    """3x3 depthwise convolution, Keras padding rules for stride 1 and 2"""
+
+    n, h, w, c = x.shape
+    if stride == 1:
+        padded = np.pad(x, ((0, 0), (1, 1), (1, 1), (0, 0)))
+        oh, ow = h, w
+    else:
+        padded = np.pad(x, ((0, 0), (0, 1), (0, 1), (0, 0)))
+        oh, ow = h // 2, w // 2
+
+    out = np.zeros((n, oh, ow, c), dtype=np.float32)
+    for i in range(3):
+        for j in range(3):
+            out += padded[:, i:i + stride * oh:stride, j:j + stride * ow:stride, :] * kernel[i, j]
+    out += bias
+    return _relu6(out)
+
+
+def _softmax(logits):
+    shifted = np.exp(logits - logits.max(axis=-1, keepdims=True))
+    return shifted / shifted.sum(axis=-1, keepdims=True)
+
+
+def read_tfjs_weights(model_path=MODEL_PATH):
+    """Read the weightsManifest of model.json into a list of (name, ndarray)"""
+
+    with open(os.path.join(model_path, "model.json"), 'r') as f:
+        model_json = json.load(f)
+
+    tensors = []
+    for group in model_json["weightsManifest"]:
+        buffer = b""
+        for weights_file in group["paths"]:
+            with open(os.path.join(model_path, weights_file), 'rb') as f:
+                buffer += f.read()
+
+        offset = 0
+        for spec in group["weights"]:
+            count = math.prod(spec["shape"])
+            array = np.frombuffer(buffer, dtype=np.float32, count=count, offset=offset)
+            tensors.append((spec["name"], array.reshape(spec["shape"])))
+            offset += count * 4
+    return tensors
+
+
+def _fold_batch_norm(kernel, gamma, beta, mean, variance):
+    """Fold an inference-mode BatchNorm into the preceding conv kernel and bias"""
+
+    scale = gamma / np.sqrt(variance + BN_EPSILON)
+    if kernel.shape[-1] == 1:
+        # Depthwise kernels are (3, 3, C, 1): scale per input channel
+        kernel = kernel[..., 0] * scale
+    else:
+        kernel = kernel * scale
+    bias = beta - mean * scale
+    return kernel.astype(np.float32), bias.astype(np.float32)
+
+
+class MobileNetV2:
+    """NumPy MobileNetV2 classifier built from the converted TensorFlow.js weights"""
+
+    def __init__(self, stem, blocks, head, classifier, labels, threads=1, blas_threads=None):
+        self.stem = stem
+        self.blocks = blocks
+        self.head = head
+        self.classifier = classifier
+        self.labels = labels
+        self.nodes, self.shapes = build_graph(stem, blocks, head, IMAGE_SIZE)
+        self.threads = threads
+        self.blas_threads = blas_threads
+        self._executor = None
+
+    @classmethod
+    def from_tfjs(cls, model_path=MODEL_PATH, threads=None, blas_threads=None):
+        """
+        Build the network from model.json + model.weights.bin
+
+        threads / blas_threads default to this host's autotuned profile, if any.
+
+        Weights are stored in Keras variable order: each conv kernel is followed
+        by its BatchNorm gamma, beta, moving mean and moving variance, and the
+        final two tensors are the dense classifier kernel and bias.
+        """
+
+        tensors = [array for _, array in read_tfjs_weights(model_path)]
+        dense_kernel, dense_bias = tensors[-2], tensors[-1]
+        conv_tensors = tensors[:-2]
+        if len(conv_tensors) % 5:
+            raise ValueError("Unexpected weight layout in model.json (expected conv + BatchNorm groups)")
+
+        units = [_fold_batch_norm(*conv_tensors[i:i + 5]) for i in range(0, len(conv_tensors), 5)]
+
+        stem_kernel, stem_bias = units[0]
+        stem = (stem_kernel.reshape(-1, stem_kernel.shape[-1]), stem_bias)
+
+        blocks = []
+        position = 1
+        while position < len(units) - 1:
+            expand = None
+            kernel, bias = units[position]
+            if kernel.shape[:2] == (1, 1):
+                expand = (kernel[0, 0], bias)
+                position += 1
+            depthwise = units[position]
+            project_kernel, project_bias = units[position + 1]
+            position += 2
+
+            block_id = len(blocks)
+            in_channels = expand[0].shape[0] if expand else depthwise[0].shape[-1]
+            out_channels = project_kernel.shape[-1]
+            stride = 2 if block_id in STRIDE_2_BLOCKS else 1
+            blocks.append({
+                "expand": expand,
+                "depthwise": depthwise,
+                "project": (project_kernel[0, 0], project_bias),
+                "stride": stride,
+                "residual": stride == 1 and in_channels == out_channels,
+            })
+
+        head_kernel, head_bias = units[-1]
+        head = (head_kernel[0, 0], head_bias)
+        classifier = (dense_kernel.astype(np.float32), dense_bias.astype(np.float32))
+        if threads is None:
+            profile = load_host_profile() or {}
+            threads = profile.get("threads", 1)
+            blas_threads = blas_threads or profile.get("blas_threads")
+        return cls(stem, blocks, head, classifier, load_labels(model_path), threads, blas_threads)
+
+    def executor(self, batch_size):
+        """Planned executor with an arena for at least batch_size images (re-planned when it grows)"""
+
+        if self._executor is None or self._executor.plan.batch_size < batch_size:
+            self._close_executor()
+            plan = plan_memory(self.nodes, self.shapes, batch_size)
+            if self.threads > 1:
+                self._executor = ParallelExecutor(self.nodes, self.shapes, plan, self.threads, self.blas_threads)
+            else:
+                self._executor = PlannedExecutor(self.nodes, self.shapes, plan)
+        return self._executor
+
+    def set_threads(self, threads, blas_threads=None):
+        """Change the intra-op thread count (and optionally BLAS threads) used by predict()"""
+
+        if (threads, blas_threads) != (self.threads, self.blas_threads):
+            self.threads = threads
+            self.blas_threads = blas_threads
+            self._close_executor()
+
+    def _close_executor(self):
+        if isinstance(self._executor, ParallelExecutor):
+            self._executor.close()
+        self._executor = None
+
+    def predict(self, images):
+        """Run a forward pass over an NHWC batch and return class probabilities"""
+
+        images = np.ascontiguousarray(images, dtype=np.float32)
+        executor = self.executor(len(images))
+        if isinstance(executor, ParallelExecutor):
+            features = executor.run(images)
+        else:
+            with limit_blas_threads(self.blas_threads):
+                features = executor.run(images)
+        return _softmax(features @ self.classifier[0] + self.classifier[1])
+
+    def predict_naive(self, images):
+        """Reference forward pass that allocates fresh activations at every layer"""
+
+        x = _conv_stem(images.astype(np.float32, copy=False), *self.stem)
+        for block in self.blocks:
+            inputs = x
+            if block["expand"]:
+                x = _pointwise(x, *block["expand"])
+            x = _depthwise(x, *block["depthwise"], block["stride"])
+            x = _pointwise(x, *block["project"], relu=False)
+            if block["residual"]:
+                x = x + inputs
+        x = _pointwise(x, *self.head)
+        features = x.mean(axis=(1, 2))
+        return _softmax(features @ self.classifier[0] + self.classifier[1])
+
+    def predict_paths(self, paths, batch_size=16):
+        """Classify image files in batches, returning an (N, classes) probability array"""
+
+        probabilities = []
+        for start in range(0, len(paths), batch_size):
+            probabilities.append(self.predict(load_batch(paths[start:start + batch_size])))
+        if not probabilities:
+            return np.zeros((0, len(self.labels)), dtype=np.float32)
+        return np.concatenate(probabilities)
@@ -0,0 +1,320 @@
+"""
+Static activation memory planner for the NumPy MobileNetV2 forward pass.
+
+The network is lowered to a flat list of nodes (stem, pointwise, depthwise,
+pool) over named activation tensors. From the node order we know when each
+tensor is produced and last read, so tensors whose lifetimes don't overlap
+can share memory: they are packed at offsets in one preallocated arena. The
+planned executor then runs every op with out= into views of that arena,
+instead of allocating a fresh activation (plus temporaries) at every layer.
+"""
+
+import math
+import argparse
+import numpy as np
+
+
+def build_graph(stem, blocks, head, image_size):
+    """
+    Lower MobileNetV2 weights into (nodes, shapes)
+
+    shapes maps tensor name -> per-image (H, W, C). The batch input is the
+    external tensor "input" and is never planned.
+    """
+
+    shapes = {"input": (image_size, image_size, 3)}
+    nodes = []
+
+    def add(op, inputs, shape, scratch_shape=None, **params):
+        output = f"t{len(nodes)}"
+        shapes[output] = shape
+        scratch = None
+        if scratch_shape:
+            scratch = f"{output}_scratch"
+            shapes[scratch] = scratch_shape
+        nodes.append({"op": op, "inputs": inputs, "output": output, "scratch": scratch, **params})
+        return output
+
+    size = image_size // 2
+    stem_kernel, stem_bias = stem
+    x = add("stem", ["input"], (size, size, stem_kernel.shape[1]),
+            scratch_shape=(size, size, stem_kernel.shape[0]), kernel=stem_kernel, bias=stem_bias)
+
+    for block in blocks:
+        block_input = x
+        if block["expand"]:
+            kernel, bias = block["expand"]
+            x = add("pointwise", [x], (size, size, kernel.shape[1]), kernel=kernel, bias=bias, relu=True)
+
+        size //= block["stride"]
+        kernel, bias = block["depthwise"]
+        channels = kernel.shape[-1]
+        x = add("depthwise", [x], (size, size, channels), scratch_shape=(size, size, channels),
+                kernel=kernel, bias=bias, stride=block["stride"])
+
+        kernel, bias = block["project"]
+        inputs = [x, block_input] if block["residual"] else [x]
+        x = add("pointwise", inputs, (size, size, kernel.shape[1]), kernel=kernel, bias=bias, relu=False)
+
+    kernel, bias = head
+    x = add("pointwise", [x], (size, size, kernel.shape[1]), kernel=kernel, bias=bias, relu=True)
+    add("pool", [x], (1, 1, kernel.shape[1]))
+    return nodes, shapes
+
+
+# Tensor offsets are aligned to 16 float32 elements (64 bytes, one cache line)
+ALIGNMENT = 16
+
+
+class MemoryPlan:
+    """Result of plan_memory: tensor -> arena offset plus size accounting (in float32 elements)"""
+
+    def __init__(self, batch_size, offsets, arena_size, tensor_sizes, naive_peak):
+        self.batch_size = batch_size
+        self.offsets = offsets
+        self.arena_size = arena_size
+        self.tensor_sizes = tensor_sizes
+        self.naive_peak = naive_peak
+
+    @property
+    def naive_total_bytes(self):
+        """Bytes allocated per forward pass when every activation is a fresh array"""
+        return sum(self.tensor_sizes.values()) * 4
+
+    @property
+    def naive_peak_bytes(self):
+        """Peak live activation bytes with fresh arrays freed as soon as possible"""
+        return self.naive_peak * 4
+
+    @property
+    def planned_bytes(self):
+        return self.arena_size * 4
+
+    def report(self):
+        mb = 1024 * 1024
+        overhead = self.planned_bytes / self.naive_peak_bytes - 1
+        print(f"🧠 Memory plan (batch {self.batch_size})")
+        print(f"  - Activation tensors: {len(self.tensor_sizes)} packed into one arena")
+        print(f"  - Naive allocation per forward pass: {self.naive_total_bytes / mb:,.1f} MB")
+        print(f"  - Naive peak (live activations): {self.naive_peak_bytes / mb:,.1f} MB")
+        print(f"  - Planned peak (preallocated arena): {self.planned_bytes / mb:,.1f} MB "
+              f"({overhead:+.1%} vs naive peak)")
+
+
+def _align(size):
+    return -(-size // ALIGNMENT) * ALIGNMENT
+
+
+def plan_memory(nodes, shapes, batch_size):
+    """
+    Greedy-by-size packing of activation tensors into one arena
+
+    Tensors are placed largest first. Each one takes the lowest-offset gap
+    (best fit) between already placed tensors whose lifetimes overlap its own,
+    or goes after the last of them. A node's output and scratch overlap the
+    lifetime of its inputs, so an op never writes into memory it is still
+    reading. The arena ends up close to the naive live peak, which is the
+    lower bound for any plan.
+    """
+
+    sizes = {name: batch_size * math.prod(shape) for name, shape in shapes.items() if name != "input"}
+
+    first_use, last_use = {}, {}
+    for index, node in enumerate(nodes):
+        for name in [node["output"], node["scratch"]]:
+            if name:
+                first_use[name] = index
+                last_use[name] = index
+        for name in node["inputs"]:
+            last_use[name] = index
+
+    naive_peak = 0
+    for index in range(len(nodes)):
+        live = sum(sizes[name] for name in sizes if first_use[name] <= index <= last_use[name])
+        naive_peak = max(naive_peak, live)
+
+    offsets = {}
+    for name in sorted(sizes, key=lambda tensor: (-sizes[tensor], first_use[tensor])):
+        size = _align(sizes[name])
+        overlapping = sorted(
+            (offsets[other], offsets[other] + _align(sizes[other])) for other in offsets
+            if not (last_use[other] < first_use[name] or last_use[name] < first_use[other])
+        )
+
+        best, best_gap, position = None, None, 0
+        for start, end in overlapping:
+            gap = start - position
+            if gap >= size and (best_gap is None or gap < best_gap):
+                best, best_gap = position, gap
+            position = max(position, end)
+        offsets[name] = best if best is not None else position
+
+    arena_size = max((offsets[name] + _align(sizes[name]) for name in offsets), default=0)
+    return MemoryPlan(batch_size, offsets, arena_size, sizes, naive_peak)
+
+
+def _valid_range(offset, pad, stride, size, out_size):
+    """Output rows (o0, o1) whose kernel tap `offset` lands inside the input, and the input rows they read"""
+
+    first = max(0, -((offset - pad) // stride))
+    last = min(out_size - 1, (size - 1 + pad - offset) // stride)
+    if first > last:
+        return None
+    return first, last + 1, stride * first + offset - pad, stride * last + offset - pad + 1
+
+
+def stem_into(x, kernel, bias, out, columns):
+    """3x3 stride-2 conv: im2col into the scratch columns, then one matmul into out"""
+
+    n, h, w, c = x.shape
+    _, oh, ow, _ = out.shape
+    patches = columns.reshape(n, oh, ow, 9, c)
+    columns.fill(0.0)
+    for i in range(3):
+        rows = _valid_range(i, 0, 2, h, oh)
+        for j in range(3):
+            cols = _valid_range(j, 0, 2, w, ow)
+            if rows is None or cols is None:
+                continue
+            o0, o1, i0, i1 = rows
+            q0, q1, j0, j1 = cols
+            patches[:, o0:o1, q0:q1, i * 3 + j, :] = x[:, i0:i1:2, j0:j1:2, :]
+
+    out2d = out.reshape(n * oh * ow, -1)
+    np.matmul(columns.reshape(n * oh * ow, 9 * c), kernel, out=out2d)
+    out2d += bias
+    np.clip(out, 0.0, 6.0, out=out)
+
+
+def pointwise_into(x, kernel, bias, out, relu=True, residual=None):
+    """1x1 conv as a matmul straight into out, with optional fused residual add"""
+
+    n, h, w, c = x.shape
+    out2d = out.reshape(n * h * w, -1)
+    np.matmul(x.reshape(n * h * w, c), kernel, out=out2d)
+    out2d += bias
+    if residual is not None:
+        out += residual
+    if relu:
+        np.clip(out, 0.0, 6.0, out=out)
+
+
+def depthwise_into(x, kernel, bias, stride, out, scratch):
+    """
+    3x3 depthwise conv without a padded copy of the input
+
+    Each kernel tap only touches the output region where it lands inside the
+    input, so padding is implicit; the tap product goes through scratch.
+    """
+
+    n, h, w, c = x.shape
+    _, oh, ow, _ = out.shape
+    pad = 1 if stride == 1 else 0
+    out[...] = bias
+    for i in range(3):
+        rows = _valid_range(i, pad, stride, h, oh)
+        for j in range(3):
+            cols = _valid_range(j, pad, stride, w, ow)
+            if rows is None or cols is None:
+                continue
+            o0, o1, i0, i1 = rows
+            q0, q1, j0, j1 = cols
+            product = scratch[:, :o1 - o0, :q1 - q0, :]
+            np.multiply(x[:, i0:i1:stride, j0:j1:stride, :], kernel[i, j], out=product)
+            out[:, o0:o1, q0:q1, :] += product
+    np.clip(out, 0.0, 6.0, out=out)
+
+
+class PlannedExecutor:
+    """Runs the graph in one preallocated arena sized for up to plan.batch_size images"""
+
+    def __init__(self, nodes, shapes, plan):
+        self.nodes = nodes
+        self.shapes = shapes
+        self.plan = plan
+        self.arena = np.empty(plan.arena_size, dtype=np.float32)
+        self._views = {}
+
+    def views(self, batch_size):
+        """Tensor views into the arena for a batch of batch_size (<= planned)"""
+
+        if batch_size not in self._views:
+            views = {}
+            for name, offset in self.plan.offsets.items():
+                shape = (batch_size,) + tuple(self.shapes[name])
+                views[name] = self.arena[offset:offset + math.prod(shape)].reshape(shape)
+            self._views[batch_size] = views
+        return self._views[batch_size]
+
+    def bind(self, images):
+        """Views for this batch, plus the external input tensor"""
+
+        views = dict(self.views(len(images)))
+        views["input"] = images
+        return views
+
+    def run_node(self, node, views):
+        inputs = [views[name] for name in node["inputs"]]
+        out = views[node["output"]]
+        if node["op"] == "stem":
+            stem_into(inputs[0], node["kernel"], node["bias"], out, views[node["scratch"]])
+        elif node["op"] == "pointwise":
+            residual = inputs[1] if len(inputs) > 1 else None
+            pointwise_into(inputs[0], node["kernel"], node["bias"], out, node["relu"], residual)
+        elif node["op"] == "depthwise":
+            depthwise_into(inputs[0], node["kernel"], node["bias"], node["stride"], out,
+                           views[node["scratch"]])
+        elif node["op"] == "pool":
+            np.mean(inputs[0], axis=(1, 2), keepdims=True, out=out)
+
+    def run_nodes(self, views):
+        for node in self.nodes:
+            self.run_node(node, views)
+
+    def run(self, images):
+        """Forward pass up to global pooling; returns an (N, C) view into the arena"""
+
+        views = self.bind(images)
+        self.run_nodes(views)
+        return views[self.nodes[-1]["output"]].reshape(len(images), -1)
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+    from health_model import MobileNetV2, list_split, load_batch
+
+    parser = argparse.ArgumentParser(description="Cocoscan activation memory planner")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--benchmark", action="store_true",
+                        help="Time naive vs planned forward passes on the test split")
+    args = parser.parse_args()
+
+    print("Cocoscan Activation Memory Planner")
+    print("=" * 50)
+
+    model = MobileNetV2.from_tfjs(threads=1)
+    plan = plan_memory(model.nodes, model.shapes, args.batch_size)
+    plan.report()
+
+    if args.benchmark:
+        paths = [path for path, _ in list_split("test")][:args.batch_size]
+        images = load_batch(paths)
+
+        start = time.perf_counter()
+        naive = model.predict_naive(images)
+        naive_seconds = time.perf_counter() - start
+
+        model.predict(images)  # first call allocates the arena
+        start = time.perf_counter()
+        planned = model.predict(images)
+        planned_seconds = time.perf_counter() - start
+
+        print(f"\n⏱️  Forward pass on {len(images)} test images")
+        print(f"  - Naive:   {naive_seconds:.2f}s")
+        print(f"  - Planned: {planned_seconds:.2f}s")
+        difference = np.abs(naive - planned).max()
+        print(f"  - Max probability difference: {difference:.2e}")
+        if difference > 1e-4:
+            print("❌ Planned output does not match the naive forward pass")
+            sys.exit(1)
@@ -0,0 +1,373 @@
+"""
+Local versioned registry for the converted TensorFlow.js model.
+
+Every registered version of assets/model (model.json + weight shards) is
+stored content-addressed under assets/model/registry/objects, with a version
+manifest that records the sha256 of every weight tensor. Between any two
+versions a tensor-level delta can be produced: a patch.bin holding only the
+changed tensors plus a patch.json describing how to rebuild the target shards
+from the base version. Head-only retrains then ship kilobytes instead of the
+full weights file.
+"""
+
+import os
+import sys
+import json
+import math
+import shutil
+import hashlib
+import tempfile
+import argparse
+from datetime import datetime
+
+from health_model import MODEL_PATH
+
+REGISTRY_PATH = os.path.join(MODEL_PATH, "registry")
+
+DTYPE_SIZES = {
+    "float32": 4,
+    "int32": 4,
+    "float16": 2,
+    "uint16": 2,
+    "uint8": 1,
+    "bool": 1,
+}
+
+
+def sha256_bytes(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def _tensor_nbytes(spec):
+    """Stored size of one weightsManifest entry (honours tfjs weight quantization)"""
+
+    dtype = spec.get("quantization", {}).get("dtype", spec["dtype"])
+    if dtype not in DTYPE_SIZES:
+        raise ValueError(f"Unsupported weight dtype: {dtype}")
+    return math.prod(spec["shape"]) * DTYPE_SIZES[dtype]
+
+
+class ModelRegistry:
+    """Content-addressed store of model versions under assets/model/registry"""
+
+    def __init__(self, registry_path=REGISTRY_PATH):
+        self.registry_path = registry_path
+        self.objects_path = os.path.join(registry_path, "objects")
+        self.versions_path = os.path.join(registry_path, "versions")
+
+    # Object store
+
+    def put_object(self, data):
+        digest = sha256_bytes(data)
+        object_path = os.path.join(self.objects_path, digest)
+        if not os.path.exists(object_path):
+            os.makedirs(self.objects_path, exist_ok=True)
+            # Write to a temp file and rename, so a killed write never leaves a truncated object under its digest
+            fd, temp_path = tempfile.mkstemp(prefix=".tmp-", dir=self.objects_path)
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(data)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(temp_path, object_path)
+            except BaseException:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                raise
+        return digest
+
+    def get_object(self, digest):
+        with open(os.path.join(self.objects_path, digest), 'rb') as f:
+            data = f.read()
+        if sha256_bytes(data) != digest:
+            raise ValueError(f"Corrupt registry object: {digest}")
+        return data
+
+    # Versions
+
+    def versions(self):
+        if not os.path.isdir(self.versions_path):
+            return []
+        manifests = [self.load_version(file[:-5]) for file in os.listdir(self.versions_path) if file.endswith(".json")]
+        return sorted(manifests, key=lambda manifest: manifest["created"])
+
+    def load_version(self, version):
+        manifest_path = os.path.join(self.versions_path, f"{version}.json")
+        if not os.path.exists(manifest_path):
+            raise KeyError(f"Unknown model version: {version}")
+        with open(manifest_path, 'r') as f:
+            return json.load(f)
+
+    def register(self, model_path=MODEL_PATH, version=None):
+        """Snapshot model.json and its weight shards as a new version"""
+
+        with open(os.path.join(model_path, "model.json"), 'rb') as f:
+            model_json_bytes = f.read()
+        model_json = json.loads(model_json_bytes)
+
+        files = []
+        tensors = []
+        for group_index, group in enumerate(model_json["weightsManifest"]):
+            buffer = b""
+            for weights_file in group["paths"]:
+                with open(os.path.join(model_path, weights_file), 'rb') as f:
+                    data = f.read()
+                files.append({
+                    "path": weights_file,
+                    "group": group_index,
+                    "size": len(data),
+                    "sha256": self.put_object(data),
+                })
+                buffer += data
+
+            offset = 0
+            for spec in group["weights"]:
+                nbytes = _tensor_nbytes(spec)
+                tensors.append({
+                    "name": spec["name"],
+                    "group": group_index,
+                    "offset": offset,
+                    "size": nbytes,
+                    "sha256": sha256_bytes(buffer[offset:offset + nbytes]),
+                })
+                offset += nbytes
+
+        existing = self.versions()
+        model_json_digest = self.put_object(model_json_bytes)
+        for manifest in existing:
+            if manifest["model_json"] == model_json_digest and manifest["files"] == files:
+                print(f"ℹ️  Model already registered as {manifest['version']}")
+                return manifest
+
+        version = version or f"v{len(existing) + 1}"
+        if any(manifest["version"] == version for manifest in existing):
+            raise ValueError(f"Model version already exists: {version}")
+
+        manifest = {
+            "version": version,
+            "created": datetime.now().isoformat(),
+            "model_json": model_json_digest,
+            "files": files,
+            "tensors": tensors,
+        }
+        os.makedirs(self.versions_path, exist_ok=True)
+        with open(os.path.join(self.versions_path, f"{manifest['version']}.json"), 'w') as f:
+            json.dump(manifest, f, indent=2)
+        return manifest
+
+    def checkout(self, version, output_path):
+        """Write a stored version back out as model.json + weight shards"""
+
+        manifest = self.load_version(version)
+        os.makedirs(output_path, exist_ok=True)
+        with open(os.path.join(output_path, "model.json"), 'wb') as f:
+            f.write(self.get_object(manifest["model_json"]))
+        for file in manifest["files"]:
+            with open(os.path.join(output_path, file["path"]), 'wb') as f:
+                f.write(self.get_object(file["sha256"]))
+
+    def _group_buffers(self, manifest):
+        buffers = {}
+        for file in manifest["files"]:
+            buffers[file["group"]] = buffers.get(file["group"], b"") + self.get_object(file["sha256"])
+        return buffers
+
+    # Deltas
+
+    def diff(self, base_version, target_version, output_path):
+        """
+        Write patch.json + patch.bin turning base_version into target_version
+
+        Tensors whose name and sha256 match a base tensor are copied from the
+        base weights; everything else is stored in patch.bin.
+        """
+
+        base = self.load_version(base_version)
+        target = self.load_version(target_version)
+        base_tensors = {(tensor["name"], tensor["sha256"]): tensor for tensor in base["tensors"]}
+        target_buffers = self._group_buffers(target)
+
+        patch = b""
+        segments = []
+        for tensor in target["tensors"]:
+            match = base_tensors.get((tensor["name"], tensor["sha256"]))
+            if match:
+                segments.append({"source": "base", "group": match["group"], "offset": match["offset"],
+                                 "size": tensor["size"]})
+            else:
+                data = target_buffers[tensor["group"]][tensor["offset"]:tensor["offset"] + tensor["size"]]
+                segments.append({"source": "patch", "offset": len(patch), "size": tensor["size"],
+                                 "name": tensor["name"]})
+                patch += data
+            segments[-1]["target_group"] = tensor["group"]
+
+        patch_manifest = {
+            "base": base_version,
+            "target": target_version,
+            "model_json": self.get_object(target["model_json"]).decode("utf-8"),
+            "base_files": base["files"],
+            "files": target["files"],
+            "segments": segments,
+            "patch_sha256": sha256_bytes(patch),
+        }
+
+        os.makedirs(output_path, exist_ok=True)
+        with open(os.path.join(output_path, "patch.bin"), 'wb') as f:
+            f.write(patch)
+        with open(os.path.join(output_path, "patch.json"), 'w') as f:
+            json.dump(patch_manifest, f, indent=2)
+
+        changed = [segment["name"] for segment in segments if segment["source"] == "patch"]
+        full_size = sum(file["size"] for file in target["files"])
+        print(f"📦 Delta {base_version} -> {target_version}: {len(changed)} / {len(segments)} tensors changed")
+        print(f"  - patch.bin: {len(patch):,} bytes (full weights: {full_size:,} bytes)")
+        return patch_manifest
+
+
+def apply_patch(base_path, patch_path, output_path):
+    """
+    Rebuild the target model from a checked-out base model and a patch directory
+
+    This is all a client needs: it does not touch the registry. The base shards
+    must match the base version's sha256s and the rebuilt shards the target's,
+    otherwise ValueError is raised before anything is written.
+    """
+
+    with open(os.path.join(patch_path, "patch.json"), 'r') as f:
+        patch_manifest = json.load(f)
+    with open(os.path.join(patch_path, "patch.bin"), 'rb') as f:
+        patch = f.read()
+    if sha256_bytes(patch) != patch_manifest["patch_sha256"]:
+        raise ValueError("patch.bin does not match patch.json (corrupt download?)")
+
+    base_buffers = {}
+    for file in patch_manifest["base_files"]:
+        weights_path = os.path.join(base_path, file["path"])
+        if not os.path.exists(weights_path):
+            raise ValueError(f"Base model is not {patch_manifest['base']}: {file['path']} is missing")
+        with open(weights_path, 'rb') as f:
+            data = f.read()
+        if sha256_bytes(data) != file["sha256"]:
+            raise ValueError(f"Base model is not {patch_manifest['base']}: {file['path']} differs")
+        base_buffers[file["group"]] = base_buffers.get(file["group"], b"") + data
+
+    target_buffers = {}
+    for segment in patch_manifest["segments"]:
+        if segment["source"] == "base":
+            source = base_buffers[segment["group"]]
+        else:
+            source = patch
+        data = source[segment["offset"]:segment["offset"] + segment["size"]]
+        target_buffers[segment["target_group"]] = target_buffers.get(segment["target_group"], b"") + data
+
+    # Split each rebuilt group buffer back into its original shard files
+    shards = []
+    offsets = {}
+    for file in patch_manifest["files"]:
+        start = offsets.get(file["group"], 0)
+        data = target_buffers.get(file["group"], b"")[start:start + file["size"]]
+        if sha256_bytes(data) != file["sha256"]:
+            raise ValueError(f"Rebuilt {file['path']} does not match {patch_manifest['target']}")
+        shards.append((file["path"], data))
+        offsets[file["group"]] = start + file["size"]
+
+    os.makedirs(output_path, exist_ok=True)
+    # Binary mode so the bytes (and line endings) match the target exactly
+    with open(os.path.join(output_path, "model.json"), 'wb') as f:
+        f.write(patch_manifest["model_json"].encode("utf-8"))
+    for path, data in shards:
+        with open(os.path.join(output_path, path), 'wb') as f:
+            f.write(data)
+
+
+def verify_patch(registry, patch_path, work_path=None):
+    """
+    Apply a patch to its base version and check the result is byte-identical to the target
+
+    Works in a fresh temporary directory (created inside work_path if given)
+    and removes only that directory afterwards.
+    """
+
+    with open(os.path.join(patch_path, "patch.json"), 'r') as f:
+        patch_manifest = json.load(f)
+    target = registry.load_version(patch_manifest["target"])
+
+    if work_path:
+        os.makedirs(work_path, exist_ok=True)
+    temp_path = tempfile.mkdtemp(prefix="cocoscan-verify-", dir=work_path)
+    try:
+        return _verify_in(registry, patch_manifest, target, patch_path, temp_path)
+    finally:
+        shutil.rmtree(temp_path, ignore_errors=True)
+
+
+def _verify_in(registry, patch_manifest, target, patch_path, temp_path):
+    base_path = os.path.join(temp_path, "base")
+    output_path = os.path.join(temp_path, "patched")
+    registry.checkout(patch_manifest["base"], base_path)
+    try:
+        apply_patch(base_path, patch_path, output_path)
+    except ValueError as e:
+        print(f"  ❌ {e}")
+        return False
+
+    expected = [("model.json", target["model_json"])]
+    expected += [(file["path"], file["sha256"]) for file in target["files"]]
+
+    success = True
+    for file, digest in expected:
+        with open(os.path.join(output_path, file), 'rb') as f:
+            actual = sha256_bytes(f.read())
+        if actual == digest:
+            print(f"  ✓ {file}")
+        else:
+            print(f"  ❌ {file} differs from {patch_manifest['target']}")
+            success = False
+    return success
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cocoscan model registry")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    register_parser = subparsers.add_parser("register", help="Register assets/model as a new version")
+    register_parser.add_argument("--version", default=None)
+    register_parser.add_argument("--model-path", default=MODEL_PATH)
+
+    subparsers.add_parser("list", help="List registered versions")
+
+    checkout_parser = subparsers.add_parser("checkout", help="Write a version to a directory")
+    checkout_parser.add_argument("version")
+    checkout_parser.add_argument("output")
+
+    diff_parser = subparsers.add_parser("diff", help="Build a tensor-level patch between two versions")
+    diff_parser.add_argument("base")
+    diff_parser.add_argument("target")
+    diff_parser.add_argument("output")
+
+    verify_parser = subparsers.add_parser("verify", help="Apply a patch and compare with its target version")
+    verify_parser.add_argument("patch")
+    verify_parser.add_argument("--work-dir", default=None,
+                               help="Directory to create the temporary verify folder in (default: system temp)")
+
+    args = parser.parse_args()
+    registry = ModelRegistry()
+
+    if args.command == "register":
+        manifest = registry.register(args.model_path, args.version)
+        print(f"✅ Model version {manifest['version']} ({len(manifest['tensors'])} tensors)")
+    elif args.command == "list":
+        for manifest in registry.versions():
+            size = sum(file["size"] for file in manifest["files"])
+            print(f"  - {manifest['version']}  {manifest['created']}  {size:,} bytes")
+    elif args.command == "checkout":
+        registry.checkout(args.version, args.output)
+        print(f"✅ Checked out {args.version} to: {args.output}")
+    elif args.command == "diff":
+        registry.diff(args.base, args.target, args.output)
+    elif args.command == "verify":
+        if verify_patch(registry, args.patch, args.work_dir):
+            print("✅ Patched model is byte-identical to the target version")
+        else:
+            print("💥 Patch verification failed")
+            sys.exit(1)
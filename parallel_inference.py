@@ -0,0 +1,173 @@
+"""
+Multi-core intra-op parallelism for the planned NumPy forward pass.
+
+NumPy's matmul and ufunc kernels release the GIL, so a plain thread pool can
+keep several cores busy inside one process:
+
+* batch >= threads: the batch is cut into one slice per thread and each
+  thread runs the whole graph on its slice in its own arena, planned for
+  ceil(batch / threads) images (no per-layer synchronisation). The arena
+  can't be shared: packed tensors sit at offsets planned for the full batch,
+  so a slice of one tensor would overlap another slice's tensors. BLAS is
+  held to one thread meanwhile so the two pools don't oversubscribe the cores.
+* batch < threads: depthwise convs (the bulk of MobileNetV2 latency) are
+  split into channel groups across the pool, while the 1x1 convs run on the
+  calling thread and may use `threads` BLAS threads. Every op writes
+  disjoint channels, so one arena is shared.
+
+Changing BLAS threading at runtime needs threadpoolctl (optional); without it
+BLAS keeps whatever OMP_NUM_THREADS / OPENBLAS_NUM_THREADS it started with.
+"""
+
+import os
+import time
+import argparse
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from memory_planner import PlannedExecutor, depthwise_into, plan_memory
+
+try:
+    from threadpoolctl import threadpool_limits
+except ImportError:
+    threadpool_limits = None
+
+BENCHMARK_THREADS = (1, 2, 4, 8, 16)
+
+
+@contextmanager
+def limit_blas_threads(threads):
+    """Limit BLAS to `threads` threads inside the block (no-op without threadpoolctl)"""
+
+    if threadpool_limits is None or threads is None:
+        yield
+        return
+    with threadpool_limits(limits=threads, user_api="blas"):
+        yield
+
+
+def _split(total, parts):
+    bounds = np.linspace(0, total, parts + 1).astype(int)
+    return [(start, stop) for start, stop in zip(bounds[:-1], bounds[1:]) if stop > start]
+
+
+class ParallelExecutor:
+    """Spreads each forward pass over a thread pool, for batches of up to plan.batch_size images"""
+
+    def __init__(self, nodes, shapes, plan, threads, blas_threads=None):
+        self.nodes = nodes
+        self.shapes = shapes
+        self.plan = plan
+        self.threads = threads
+        self.blas_threads = blas_threads
+
+        slice_plan = plan_memory(nodes, shapes, -(-plan.batch_size // threads))
+        self.workers = [PlannedExecutor(nodes, shapes, slice_plan) for _ in range(threads)]
+        split_plan = plan_memory(nodes, shapes, max(1, min(plan.batch_size, threads - 1)))
+        self.shared = PlannedExecutor(nodes, shapes, split_plan)
+        self.pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="cocoscan-inference")
+
+    def run_node(self, node, views):
+        """Run one node in the shared arena, splitting depthwise convs into channel groups"""
+
+        if node["op"] != "depthwise":
+            return self.shared.run_node(node, views)
+
+        x = views[node["inputs"][0]]
+        out = views[node["output"]]
+        scratch = views[node["scratch"]]
+        kernel, bias, stride = node["kernel"], node["bias"], node["stride"]
+
+        def run_group(bounds):
+            start, stop = bounds
+            depthwise_into(x[..., start:stop], kernel[..., start:stop], bias[start:stop], stride,
+                           out[..., start:stop], scratch[..., start:stop])
+
+        list(self.pool.map(run_group, _split(out.shape[-1], self.threads)))
+
+    def run(self, images):
+        """Forward pass up to global pooling; returns a new (N, C) array"""
+
+        batch_size = len(images)
+        if batch_size < self.threads:
+            views = self.shared.bind(images)
+            with limit_blas_threads(self.blas_threads or self.threads):
+                for node in self.nodes:
+                    self.run_node(node, views)
+            return views[self.nodes[-1]["output"]].reshape(batch_size, -1).copy()
+
+        features = np.empty((batch_size, self.shapes[self.nodes[-1]["output"]][-1]), dtype=np.float32)
+
+        def run_slice(worker, bounds):
+            start, stop = bounds
+            features[start:stop] = worker.run(images[start:stop])
+
+        with limit_blas_threads(self.blas_threads or 1):
+            list(self.pool.map(run_slice, self.workers, _split(batch_size, self.threads)))
+        return features
+
+    def close(self):
+        self.pool.shutdown()
+
+
+def benchmark_scaling(thread_counts=BENCHMARK_THREADS, batch_size=16, repeats=3, split="test"):
+    """
+    Throughput of the planned forward pass on a dataset split for each thread count
+
+    Every thread count's output on the first batch is checked against the
+    reference forward pass; a mismatch is reported instead of a speedup.
+    """
+
+    from health_model import MobileNetV2, list_split, load_batch
+
+    paths = [path for path, _ in list_split(split)]
+    batches = [load_batch(paths[i:i + batch_size]) for i in range(0, len(paths), batch_size)]
+    model = MobileNetV2.from_tfjs(threads=1)
+
+    cores = os.cpu_count()
+    print(f"📊 Scaling on {split} ({len(paths)} images, batch {batch_size}, {cores} cores available)")
+    if threadpool_limits is None:
+        print("⚠️  threadpoolctl not installed: BLAS threading is not managed (pip install threadpoolctl)")
+
+    reference = model.predict_naive(batches[0])
+    results = {}
+    for threads in thread_counts:
+        model.set_threads(threads)
+        # Warm-up (allocates the arenas and starts the pool) doubles as the correctness check
+        difference = np.abs(model.predict(batches[0]) - reference).max()
+        if difference > 1e-4:
+            print(f"  ❌ {threads:>2} threads: output differs from the reference by {difference:.2e}")
+            continue
+
+        best = float("inf")
+        for _ in range(repeats):
+            start = time.perf_counter()
+            for batch in batches:
+                model.predict(batch)
+            best = min(best, time.perf_counter() - start)
+
+        results[threads] = len(paths) / best
+        baseline = next(iter(results))
+        speedup = results[threads] / results[baseline]
+        note = "  (more threads than cores)" if threads > cores else ""
+        print(f"  - {threads:>2} threads: {results[threads]:7.1f} images/s  "
+              f"speedup {speedup:4.2f}x  efficiency {speedup / threads * baseline:4.0%}{note}")
+
+    model.set_threads(1)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cocoscan multi-core CPU inference benchmark")
+    parser.add_argument("--threads", type=int, nargs="+", default=list(BENCHMARK_THREADS))
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--split", default="test")
+    args = parser.parse_args()
+
+    print("Cocoscan Parallel Inference Benchmark")
+    print("=" * 50)
+
+    benchmark_scaling(args.threads, args.batch_size, args.repeats, args.split)
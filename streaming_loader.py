@@ -0,0 +1,292 @@
+"""
+Disk-backed streaming data loader for retraining / fine-tuning.
+
+`shard` packs a dataset split, shuffled once with a fixed seed, into
+fixed-size record files (the original encoded image bytes, N records per
+shard) plus a JSON index of offsets and labels. StreamingLoader then reads
+records through memory-mapped shards with a prefetching pool of decode
+workers, so memory use stays flat however large assets/dataset/train grows.
+Each shuffled epoch mixes the records of several shards at a time, so a batch
+never comes from a single shard. Shuffling, class-balanced sampling and
+augmentation are all seeded by (seed, epoch), so every run sees the same
+stream regardless of worker scheduling.
+"""
+
+import io
+import os
+import sys
+import json
+import mmap
+import time
+import argparse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+from health_model import DATASET_PATH, IMAGE_SIZE, list_split, load_labels
+
+RECORDS_PATH = os.path.join(DATASET_PATH, "records")
+SHARD_SIZE = 256
+SHUFFLE_SHARDS = 4
+
+
+def shard_dataset(split, records_path=RECORDS_PATH, shard_size=SHARD_SIZE, seed=0):
+    """Write <split>-NNNNN.rec shards of shard_size records and <split>.index.json"""
+
+    labels = load_labels()
+    samples = list_split(split, labels)
+    # list_split groups samples by class; shuffle once so every shard holds the class mix
+    samples = [samples[i] for i in np.random.default_rng(seed).permutation(len(samples))]
+    os.makedirs(records_path, exist_ok=True)
+
+    records = []
+    shards = []
+    for start in range(0, len(samples), shard_size):
+        shard = f"{split}-{len(shards):05d}.rec"
+        shards.append(shard)
+        offset = 0
+        with open(os.path.join(records_path, shard), 'wb') as f:
+            for path, label in samples[start:start + shard_size]:
+                with open(path, 'rb') as image_file:
+                    data = image_file.read()
+                f.write(data)
+                records.append({
+                    "shard": len(shards) - 1,
+                    "offset": offset,
+                    "length": len(data),
+                    "label": label,
+                    "source": os.path.relpath(path, DATASET_PATH),
+                })
+                offset += len(data)
+
+    index = {"split": split, "labels": labels, "shard_size": shard_size, "seed": seed, "shards": shards,
+             "records": records}
+    index_path = os.path.join(records_path, f"{split}.index.json")
+    with open(index_path, 'w') as f:
+        json.dump(index, f, indent=2)
+
+    counts = np.bincount([record["label"] for record in records], minlength=len(labels))
+    print(f"✅ {len(records)} {split} records in {len(shards)} shards: {index_path}")
+    print("  - " + ", ".join(f"{label}: {count}" for label, count in zip(labels, counts)))
+    return index_path
+
+
+def augment(image, rng, size=IMAGE_SIZE):
+    """Random resized crop, horizontal flip and brightness/contrast jitter"""
+
+    width, height = image.size
+    scale = rng.uniform(0.7, 1.0)
+    crop_width, crop_height = int(width * scale), int(height * scale)
+    left = int(rng.integers(0, width - crop_width + 1))
+    top = int(rng.integers(0, height - crop_height + 1))
+    image = image.resize((size, size), Image.BILINEAR, box=(left, top, left + crop_width, top + crop_height))
+    if rng.random() < 0.5:
+        image = image.transpose(Image.FLIP_LEFT_RIGHT)
+
+    pixels = np.asarray(image, dtype=np.float32)
+    contrast = rng.uniform(0.8, 1.2)
+    brightness = rng.uniform(-20.0, 20.0)
+    pixels = (pixels - pixels.mean()) * contrast + pixels.mean() + brightness
+    return np.clip(pixels, 0.0, 255.0)
+
+
+class StreamingLoader:
+    """
+    Iterates (images, labels) batches from sharded records
+
+    images are float32 NHWC scaled to [-1, 1] (MobileNetV2 preprocessing),
+    labels are int64. Set epoch (or call set_epoch) before iterating to get a
+    new deterministic order per epoch. Shuffled epochs mix the records of
+    shuffle_shards shards at a time.
+    """
+
+    def __init__(self, split, batch_size=32, records_path=RECORDS_PATH, shuffle=True, balanced=False,
+                 augment=True, workers=4, prefetch=8, seed=0, drop_last=False, shuffle_shards=SHUFFLE_SHARDS):
+        index_path = os.path.join(records_path, f"{split}.index.json")
+        if not os.path.exists(index_path):
+            raise FileNotFoundError(f"No record index for {split}: run 'python streaming_loader.py shard --split {split}'")
+        with open(index_path, 'r') as f:
+            self.index = json.load(f)
+
+        self.records_path = records_path
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.balanced = balanced
+        self.augment = augment
+        self.workers = workers
+        self.prefetch = prefetch
+        self.seed = seed
+        self.drop_last = drop_last
+        self.shuffle_shards = shuffle_shards
+        self.epoch = 0
+
+        self.records = self.index["records"]
+        self.labels = np.array([record["label"] for record in self.records])
+        self._shards = None
+
+        # Throughput / stall accounting for the last iteration
+        self.samples = 0
+        self.elapsed = 0.0
+        self.wait_time = 0.0
+
+    def __len__(self):
+        if self.drop_last:
+            return len(self.records) // self.batch_size
+        return -(-len(self.records) // self.batch_size)
+
+    def set_epoch(self, epoch):
+        self.epoch = epoch
+
+    def epoch_order(self):
+        """Record indices for the current epoch"""
+
+        rng = np.random.default_rng((self.seed, self.epoch))
+        if self.balanced:
+            # Sample with replacement, every class equally likely
+            counts = np.bincount(self.labels, minlength=len(self.index["labels"]))
+            weights = 1.0 / counts[self.labels]
+            return rng.choice(len(self.records), size=len(self.records), p=weights / weights.sum())
+
+        if not self.shuffle:
+            return np.arange(len(self.records))
+
+        # Shuffle shard order, then the pooled records of shuffle_shards shards at a
+        # time: batches draw from several shards while reads stay within a few of them
+        by_shard = {}
+        for position, record in enumerate(self.records):
+            by_shard.setdefault(record["shard"], []).append(position)
+        shards = rng.permutation(len(self.index["shards"]))
+        order = []
+        for start in range(0, len(shards), self.shuffle_shards):
+            group = [position for shard in shards[start:start + self.shuffle_shards]
+                     for position in by_shard.get(int(shard), [])]
+            order.extend(rng.permutation(group))
+        return np.array(order, dtype=int)
+
+    def _open_shards(self):
+        if self._shards is None:
+            self._shards = []
+            for shard in self.index["shards"]:
+                with open(os.path.join(self.records_path, shard), 'rb') as f:
+                    self._shards.append(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+        return self._shards
+
+    def _load_record(self, position, sample_seed):
+        record = self.records[position]
+        data = self._open_shards()[record["shard"]][record["offset"]:record["offset"] + record["length"]]
+        with Image.open(io.BytesIO(data)) as image:
+            image.draft("RGB", (IMAGE_SIZE * 2, IMAGE_SIZE * 2))
+            image = image.convert("RGB")
+            if self.augment:
+                pixels = augment(image, np.random.default_rng(sample_seed))
+            else:
+                pixels = np.asarray(image.resize((IMAGE_SIZE, IMAGE_SIZE), Image.BILINEAR), dtype=np.float32)
+        return pixels / 127.5 - 1.0
+
+    def _load_batch(self, batch_index, positions):
+        images = np.empty((len(positions), IMAGE_SIZE, IMAGE_SIZE, 3), dtype=np.float32)
+        for i, position in enumerate(positions):
+            # Per-sample seed: the same augmentation whichever worker decodes it
+            images[i] = self._load_record(position, (self.seed, self.epoch, batch_index, i))
+        return images, self.labels[positions]
+
+    def __iter__(self):
+        order = self.epoch_order()
+        batches = [order[i:i + self.batch_size] for i in range(0, len(order), self.batch_size)]
+        if self.drop_last and batches and len(batches[-1]) < self.batch_size:
+            batches.pop()
+
+        self._open_shards()  # before the workers start, so they never race to open them
+        self.samples = 0
+        self.wait_time = 0.0
+        start = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="cocoscan-loader") as pool:
+            pending = deque()
+            next_batch = 0
+            while next_batch < len(batches) or pending:
+                # Keep up to `prefetch` batches decoding ahead of the consumer
+                while next_batch < len(batches) and len(pending) < self.prefetch:
+                    pending.append(pool.submit(self._load_batch, next_batch, batches[next_batch]))
+                    next_batch += 1
+
+                wait_start = time.perf_counter()
+                images, labels = pending.popleft().result()
+                self.wait_time += time.perf_counter() - wait_start
+
+                self.samples += len(labels)
+                self.elapsed = time.perf_counter() - start
+                yield images, labels
+
+    @property
+    def samples_per_second(self):
+        return self.samples / self.elapsed if self.elapsed else 0.0
+
+    def report(self):
+        stalled = self.wait_time / self.elapsed if self.elapsed else 0.0
+        print(f"  - {self.samples} samples in {self.elapsed:.2f}s: {self.samples_per_second:.1f} samples/s")
+        print(f"  - Consumer waited on I/O for {self.wait_time:.2f}s ({stalled:.0%} of the epoch)")
+
+    def close(self):
+        for shard in self._shards or []:
+            shard.close()
+        self._shards = None
+
+
+def benchmark_loader(split, batch_size, workers, prefetch, balanced, epochs, step_ms, shuffle_shards=SHUFFLE_SHARDS):
+    """Stream epochs and report loader throughput; step_ms simulates training compute per batch"""
+
+    loader = StreamingLoader(split, batch_size, balanced=balanced, workers=workers, prefetch=prefetch,
+                             shuffle_shards=shuffle_shards)
+    print(f"📊 Streaming {split}: {len(loader.records)} records, batch {batch_size}, "
+          f"{workers} workers, prefetch {prefetch}{', class-balanced' if balanced else ''}")
+
+    for epoch in range(epochs):
+        loader.set_epoch(epoch)
+        seen = np.zeros(len(loader.index["labels"]), dtype=int)
+        for _, labels in loader:
+            seen += np.bincount(labels, minlength=len(seen))
+            if step_ms:
+                time.sleep(step_ms / 1000)
+
+        print(f"\nEpoch {epoch + 1}/{epochs}")
+        loader.report()
+        print("  - Class mix: " + ", ".join(f"{label}: {count}" for label, count in zip(loader.index["labels"], seen)))
+    loader.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cocoscan streaming data loader")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    shard_parser = subparsers.add_parser("shard", help="Pack a dataset split into record shards")
+    shard_parser.add_argument("--split", default="train")
+    shard_parser.add_argument("--shard-size", type=int, default=SHARD_SIZE, help="Records per shard")
+    shard_parser.add_argument("--seed", type=int, default=0, help="Seed of the one-off shuffle before packing")
+
+    benchmark_parser = subparsers.add_parser("benchmark", help="Measure loader throughput")
+    benchmark_parser.add_argument("--split", default="train")
+    benchmark_parser.add_argument("--batch-size", type=int, default=32)
+    benchmark_parser.add_argument("--workers", type=int, default=4)
+    benchmark_parser.add_argument("--prefetch", type=int, default=8, help="Batches decoded ahead")
+    benchmark_parser.add_argument("--balanced", action="store_true", help="Class-balanced sampling")
+    benchmark_parser.add_argument("--epochs", type=int, default=1)
+    benchmark_parser.add_argument("--step-ms", type=float, default=0.0, help="Simulated training step per batch")
+    benchmark_parser.add_argument("--shuffle-shards", type=int, default=SHUFFLE_SHARDS,
+                                  help="Shards whose records are mixed together when shuffling")
+    args = parser.parse_args()
+
+    print("Cocoscan Streaming Loader")
+    print("=" * 50)
+
+    if args.command == "shard":
+        shard_dataset(args.split, shard_size=args.shard_size, seed=args.seed)
+    else:
+        try:
+            benchmark_loader(args.split, args.batch_size, args.workers, args.prefetch,
+                             args.balanced, args.epochs, args.step_ms, args.shuffle_shards)
+        except FileNotFoundError as e:
+            print(f"❌ {e}")
+            sys.exit(1)
@@ -0,0 +1,50 @@
+import os
+import sys
+import json
+import shutil
+
+import numpy as np
+import pytest
+
+PROJECT_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_PATH)
+
+from health_model import IMAGE_SIZE, MODEL_PATH
+
+
+@pytest.fixture(scope="session")
+def model_path(tmp_path_factory):
+    """model.json + labels.json with deterministic random weights, so tests don't need the trained model"""
+
+    path = tmp_path_factory.mktemp("model")
+    shutil.copy(os.path.join(MODEL_PATH, "model.json"), path)
+    shutil.copy(os.path.join(MODEL_PATH, "labels.json"), path)
+    with open(os.path.join(MODEL_PATH, "model.json"), 'r') as f:
+        model_json = json.load(f)
+
+    # Fan-in scaled kernels and near-identity BatchNorm keep activations varied through all layers
+    rng = np.random.default_rng(0)
+    for group in model_json["weightsManifest"]:
+        arrays = []
+        for index, spec in enumerate(group["weights"]):
+            # Keras order: kernel, gamma, beta, moving mean, moving variance; dense kernel + bias last
+            shape = spec["shape"]
+            if len(shape) > 1:
+                fan_in = 9 if len(shape) == 4 and shape[-1] == 1 else np.prod(shape[:-1])
+                array = rng.normal(0.0, np.sqrt(2.0 / fan_in), shape)
+            elif index % 5 == 1 and index < len(group["weights"]) - 2:
+                array = rng.uniform(0.5, 1.0, shape)
+            elif index % 5 == 4 and index < len(group["weights"]) - 2:
+                array = rng.uniform(0.5, 1.5, shape)
+            else:
+                array = rng.normal(0.0, 0.1, shape)
+            arrays.append(array.astype(np.float32))
+        with open(os.path.join(path, group["paths"][0]), 'wb') as f:
+            f.write(b"".join(array.tobytes() for array in arrays))
+    return str(path)
+
+
+@pytest.fixture(scope="session")
+def images():
+    rng = np.random.default_rng(1)
+    return rng.uniform(-1.0, 1.0, (16, IMAGE_SIZE, IMAGE_SIZE, 3)).astype(np.float32)
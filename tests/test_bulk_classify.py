@@ -0,0 +1,114 @@
+import os
+import csv
+import json
+import shutil
+import pytest
+
+import bulk_classify
+from bulk_classify import ResumeError, classify_batch, load_checkpoints, run_bulk_job
+from health_model import list_split
+
+
+@pytest.fixture
+def input_path(tmp_path):
+    """Six real survey photos plus one truncated JPEG"""
+
+    path = tmp_path / "input"
+    path.mkdir()
+    for source, _ in list_split("test")[:6]:
+        shutil.copy(source, path)
+    with open(source, 'rb') as f:
+        (path / "truncated.jpg").write_bytes(f.read()[:2000])
+    return str(path)
+
+
+@pytest.fixture
+def cascade_model_path(model_path, tmp_path):
+    """The test model plus a cascade.json that forwards every image to the full model"""
+
+    path = tmp_path / "cascade-model"
+    shutil.copytree(model_path, path)
+    stage1 = {"mean": [0.0] * 34, "std": [1.0] * 34, "weights": [0.0] * 34, "bias": 0.0}
+    with open(path / "cascade.json", 'w') as f:
+        json.dump({"stage1": stage1, "threshold": 1.01}, f)
+    return str(path)
+
+
+def read_rows(output_path):
+    with open(output_path, 'r', newline='', encoding='utf-8') as f:
+        return list(csv.DictReader(f))
+
+
+@pytest.mark.parametrize("use_cascade", [False, True])
+def test_corrupt_image_is_reported_not_fatal(input_path, tmp_path, model_path, cascade_model_path, use_cascade):
+    output_path = str(tmp_path / "out.csv")
+    run_bulk_job(input_path, output_path, workers=2, batch_size=3,
+                 model_path=cascade_model_path if use_cascade else model_path, use_cascade=use_cascade)
+
+    rows = read_rows(output_path)
+    assert sorted(row["path"] for row in rows) == sorted(file for file in os.listdir(input_path)
+                                                         if file != "truncated.jpg")
+    errors = [error for checkpoint in load_checkpoints(output_path + ".progress.jsonl")
+              for error in checkpoint["errors"]]
+    assert [error["path"] for error in errors] == ["truncated.jpg"]
+
+
+def test_resume_after_kill(input_path, tmp_path, model_path):
+    output_path = str(tmp_path / "out.csv")
+    progress_path = output_path + ".progress.jsonl"
+    run_bulk_job(input_path, output_path, workers=1, batch_size=2, model_path=model_path)
+    expected = sorted(row["path"] for row in read_rows(output_path))
+
+    # Killed while recording the third batch: its rows reached the CSV (plus a
+    # half-written one), its progress line only half
+    with open(progress_path, 'r', encoding='utf-8') as f:
+        lines = f.readlines()
+    with open(progress_path, 'w', encoding='utf-8') as f:
+        f.writelines(lines[:2])
+        f.write(lines[2][:len(lines[2]) // 2])
+    with open(output_path, 'a', encoding='utf-8') as f:
+        f.write("LeafRot999.jpg,Unhea")
+
+    run_bulk_job(input_path, output_path, workers=1, batch_size=2, model_path=model_path)
+    rows = read_rows(output_path)
+    assert sorted(row["path"] for row in rows) == expected
+    assert len(load_checkpoints(progress_path)) == len(lines)
+
+
+def test_refuses_to_resume_without_output(input_path, tmp_path, model_path):
+    output_path = str(tmp_path / "out.csv")
+    run_bulk_job(input_path, output_path, workers=1, batch_size=4, model_path=model_path)
+    os.remove(output_path)
+
+    with pytest.raises(ResumeError):
+        run_bulk_job(input_path, output_path, workers=1, batch_size=4, model_path=model_path)
+    assert not os.path.exists(output_path)
+
+
+def test_refuses_to_resume_with_missing_parquet_part(input_path, tmp_path, model_path):
+    pytest.importorskip("pyarrow")
+    output_path = str(tmp_path / "out.parquet")
+    run_bulk_job(input_path, output_path, workers=1, batch_size=4, model_path=model_path)
+    os.remove(os.path.join(output_path, "part-00000.parquet"))
+
+    with pytest.raises(ResumeError):
+        run_bulk_job(input_path, output_path, workers=1, batch_size=4, model_path=model_path)
+
+
+def _classify_or_fail(input_path, batch):
+    """classify_batch that logs every call and fails on the first image"""
+
+    with open(os.path.join(os.path.dirname(input_path), "calls.log"), 'a') as f:
+        f.write(batch[0] + "\n")
+    if batch[0] == sorted(os.listdir(input_path))[0]:
+        raise RuntimeError("predict failed")
+    return classify_batch(input_path, batch)
+
+
+def test_worker_failure_cancels_queued_batches(input_path, tmp_path, model_path, monkeypatch):
+    monkeypatch.setattr(bulk_classify, "classify_batch", _classify_or_fail)
+
+    with pytest.raises(RuntimeError, match="predict failed"):
+        run_bulk_job(input_path, str(tmp_path / "out.csv"), workers=1, batch_size=1, model_path=model_path)
+    # 7 batches in the job, but only the bounded window was ever queued
+    assert len((tmp_path / "calls.log").read_text().splitlines()) <= 3
@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from health_model import IMAGE_SIZE, MobileNetV2
+from memory_planner import plan_memory
+
+
+def test_plan_never_overlaps_live_tensors(model_path):
+    model = MobileNetV2.from_tfjs(model_path, threads=1)
+    plan = plan_memory(model.nodes, model.shapes, 8)
+
+    lifetimes = {}
+    for index, node in enumerate(model.nodes):
+        for name in [node["output"], node["scratch"]] + node["inputs"]:
+            if name and name != "input":
+                lifetimes[name] = (lifetimes.get(name, (index,))[0], index)
+
+    for a, (a_first, a_last) in lifetimes.items():
+        for b, (b_first, b_last) in lifetimes.items():
+            if a < b and a_first <= b_last and b_first <= a_last:
+                a_end = plan.offsets[a] + plan.tensor_sizes[a]
+                b_end = plan.offsets[b] + plan.tensor_sizes[b]
+                assert a_end <= plan.offsets[b] or b_end <= plan.offsets[a], (a, b)
+
+    assert plan.naive_peak <= plan.arena_size
+
+
+@pytest.mark.parametrize("batch_size", [16, 5, 1])
+def test_planned_matches_naive(model_path, images, batch_size):
+    model = MobileNetV2.from_tfjs(model_path, threads=1)
+    batch = images[:batch_size]
+    np.testing.assert_allclose(model.predict(batch), model.predict_naive(batch), atol=1e-5)
+
+
+def test_smaller_batch_reuses_plan(model_path, images):
+    model = MobileNetV2.from_tfjs(model_path, threads=1)
+    model.predict(images)
+    np.testing.assert_allclose(model.predict(images[:3]), model.predict_naive(images[:3]), atol=1e-5)
+
+
+@pytest.mark.parametrize("threads", [2, 4, 8])
+@pytest.mark.parametrize("batch_size", [16, 13, 3])
+def test_parallel_matches_naive(model_path, images, threads, batch_size):
+    model = MobileNetV2.from_tfjs(model_path, threads=threads)
+    batch = images[:batch_size]
+    expected = model.predict_naive(batch)
+    for _ in range(3):
+        np.testing.assert_allclose(model.predict(batch), expected, atol=1e-5)
+    model.set_threads(1)
+
+
+def test_autotune_skips_configurations_that_change_output(model_path, monkeypatch):
+    import autotune
+    import parallel_inference
+
+    run = parallel_inference.ParallelExecutor.run
+    monkeypatch.setattr(parallel_inference.ParallelExecutor, "run", lambda self, images: run(self, images) + 1.0)
+    monkeypatch.setattr(autotune, "load_sample_images", lambda count: np.zeros((count, IMAGE_SIZE, IMAGE_SIZE, 3), np.float32))
+
+    profile = autotune.autotune(1e9, batch_sizes=(1, 4), max_threads=2, min_seconds=0.0, model_path=model_path)
+    assert {result["threads"] for result in profile["results"]} == {1}
+    assert profile["threads"] == 1
@@ -0,0 +1,101 @@
+import os
+import json
+
+import numpy as np
+import pytest
+
+from model_registry import ModelRegistry, apply_patch, sha256_bytes, verify_patch
+
+
+def write_model(path, seed, head_seed=None):
+    """A tiny two-tensor tfjs model; only the head changes between seeds"""
+
+    os.makedirs(path, exist_ok=True)
+    body = np.random.default_rng(seed).normal(size=(8, 4)).astype(np.float32)
+    head = np.random.default_rng(head_seed if head_seed is not None else seed).normal(size=(4, 2)).astype(np.float32)
+    model_json = {"weightsManifest": [{
+        "paths": ["group1-shard1of1.bin"],
+        "weights": [
+            {"name": "body", "shape": [8, 4], "dtype": "float32"},
+            {"name": "head", "shape": [4, 2], "dtype": "float32"},
+        ],
+    }]}
+    with open(os.path.join(path, "model.json"), 'w') as f:
+        json.dump(model_json, f)
+    with open(os.path.join(path, "group1-shard1of1.bin"), 'wb') as f:
+        f.write(body.tobytes() + head.tobytes())
+    return str(path)
+
+
+@pytest.fixture
+def registry_with_patch(tmp_path):
+    registry = ModelRegistry(str(tmp_path / "registry"))
+    registry.register(write_model(tmp_path / "model-v1", 0), "v1")
+    registry.register(write_model(tmp_path / "model-v2", 0, head_seed=1), "v2")
+    patch_manifest = registry.diff("v1", "v2", str(tmp_path / "patch"))
+    return registry, str(tmp_path / "patch"), patch_manifest
+
+
+def test_diff_ships_only_changed_tensors(registry_with_patch):
+    _, patch_path, patch_manifest = registry_with_patch
+    assert [segment["source"] for segment in patch_manifest["segments"]] == ["base", "patch"]
+    assert os.path.getsize(os.path.join(patch_path, "patch.bin")) == 4 * 2 * 4
+
+
+def test_verify_round_trip(registry_with_patch, tmp_path):
+    registry, patch_path, _ = registry_with_patch
+    assert verify_patch(registry, patch_path, str(tmp_path / "work"))
+    assert os.listdir(tmp_path / "work") == []
+
+
+def test_apply_patch_matches_target(registry_with_patch, tmp_path):
+    registry, patch_path, _ = registry_with_patch
+    registry.checkout("v1", str(tmp_path / "base"))
+    apply_patch(str(tmp_path / "base"), patch_path, str(tmp_path / "out"))
+
+    target = registry.load_version("v2")
+    with open(tmp_path / "out" / "group1-shard1of1.bin", 'rb') as f:
+        assert sha256_bytes(f.read()) == target["files"][0]["sha256"]
+
+
+def test_apply_patch_rejects_wrong_base(registry_with_patch, tmp_path):
+    registry, patch_path, _ = registry_with_patch
+    base_path = tmp_path / "base"
+    registry.checkout("v1", str(base_path))
+
+    # Flip one byte of the unchanged "body" tensor, which the patch copies from the base
+    weights_path = base_path / "group1-shard1of1.bin"
+    data = bytearray(weights_path.read_bytes())
+    data[0] ^= 0xFF
+    weights_path.write_bytes(bytes(data))
+
+    with pytest.raises(ValueError, match="Base model is not v1"):
+        apply_patch(str(base_path), patch_path, str(tmp_path / "out"))
+    assert not os.path.exists(tmp_path / "out")
+
+
+def test_apply_patch_rejects_output_mismatch(registry_with_patch, tmp_path):
+    registry, patch_path, _ = registry_with_patch
+    registry.checkout("v1", str(tmp_path / "base"))
+
+    patch_json_path = os.path.join(patch_path, "patch.json")
+    with open(patch_json_path, 'r') as f:
+        patch_manifest = json.load(f)
+    patch_manifest["files"][0]["sha256"] = "0" * 64
+    with open(patch_json_path, 'w') as f:
+        json.dump(patch_manifest, f)
+
+    with pytest.raises(ValueError, match="does not match v2"):
+        apply_patch(str(tmp_path / "base"), patch_path, str(tmp_path / "out"))
+
+
+def test_truncated_object_is_detected(registry_with_patch):
+    registry, _, _ = registry_with_patch
+    digest = registry.load_version("v1")["files"][0]["sha256"]
+    object_path = os.path.join(registry.objects_path, digest)
+    with open(object_path, 'r+b') as f:
+        f.truncate(10)
+
+    with pytest.raises(ValueError, match="Corrupt registry object"):
+        registry.get_object(digest)
+    assert not [file for file in os.listdir(registry.objects_path) if file.startswith(".tmp-")]
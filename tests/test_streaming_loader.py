@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from streaming_loader import StreamingLoader, shard_dataset
+
+
+@pytest.fixture(scope="module")
+def records_path(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("records"))
+    shard_dataset("train", records_path=path, shard_size=64)
+    return path
+
+
+def test_shards_and_batches_mix_classes(records_path):
+    loader = StreamingLoader("train", batch_size=32, records_path=records_path, augment=False)
+    minority = np.bincount(loader.labels).min() / len(loader.labels)
+
+    for shard in range(len(loader.index["shards"])):
+        labels = [record["label"] for record in loader.records if record["shard"] == shard]
+        assert len(set(labels)) == 2, f"shard {shard} holds a single class"
+
+    for epoch in range(3):
+        loader.set_epoch(epoch)
+        order = loader.epoch_order()
+        for start in range(0, len(order) - 31, 32):
+            counts = np.bincount(loader.labels[order[start:start + 32]], minlength=2)
+            # Train is ~1:3; a well mixed batch of 32 has ~8 of the minority class
+            assert counts.min() >= 32 * minority / 3, f"epoch {epoch} batch {start // 32}: {counts}"
+
+
+def test_same_seed_and_epoch_give_same_stream_for_any_worker_count(records_path):
+    def first_batches(workers, epoch):
+        loader = StreamingLoader("train", batch_size=8, records_path=records_path, workers=workers, seed=3)
+        loader.set_epoch(epoch)
+        batches = []
+        for images, labels in loader:
+            batches.append((images, labels))
+            if len(batches) == 3:
+                break
+        loader.close()
+        return batches
+
+    reference = first_batches(1, epoch=1)
+    for (images, labels), (expected_images, expected_labels) in zip(first_batches(4, epoch=1), reference):
+        np.testing.assert_array_equal(labels, expected_labels)
+        np.testing.assert_array_equal(images, expected_images)
+
+    other_epoch = first_batches(4, epoch=2)
+    assert not np.array_equal(other_epoch[0][0], reference[0][0])